@@ -5,12 +5,19 @@ import numpy as np
 import scipy as sp
 import matplotlib.pyplot as plt
 
+from scipy import sparse as sps
+from scipy.sparse.linalg import LinearOperator, eigsh
+
 from ..utils.fisher import fisher_information
+from ..utils.rqa import MEASURES, matrix_line_histograms, matrix_diagonal_rates, rqa_measures
 from ..utils.plotting import get_labels
 from ..core.rqa_res import RQARes
 
 class RecurrenceMatrix:
     '''Recurrence matrix object. Used for Recurrence Quantification Analysis (RQA).
+
+    The matrix can either be a dense numpy array or a scipy.sparse matrix (see the sparse
+    argument of ammonyte.TimeEmbeddedSeries.create_recurrence_matrix).
     '''
     def __init__(self,matrix,time,epsilon,m,tau,series = None,value_name=None,value_unit=None,time_name=None,time_unit=None,label=None):
         self.matrix = matrix
@@ -25,7 +32,65 @@ class RecurrenceMatrix:
         self.time_unit = time_unit
         self.label = label
 
-    def laplacian_eigenmaps(self,w_size, w_incre):
+    @property
+    def issparse(self):
+        '''Whether the matrix is stored in scipy.sparse format'''
+
+        return sps.issparse(self.matrix)
+
+    @property
+    def density(self):
+        '''Fraction of recurrent points in the matrix'''
+
+        if self.issparse:
+            return self.matrix.count_nonzero()/np.prod(self.matrix.shape)
+        else:
+            return np.count_nonzero(self.matrix)/np.size(self.matrix)
+
+    def rqa(self,measures=None,theiler=1,l_min=2,v_min=2):
+        '''Function to calculate classic RQA measures from the stored matrix
+
+        Line length histograms are computed by run-length encoding the stored matrix (dense or sparse),
+        so no distances are recalculated.
+
+        Parameters
+        ----------
+
+        measures : list
+            Measures to calculate. Available measures are 'RR', 'DET', 'L', 'Lmax', 'ENTR', 'LAM', 'TT', 'Vmax' and 'TREND'.
+            If None, all of them are calculated
+
+        theiler : int
+            Theiler window. Diagonal lines closer than theiler to the main diagonal are ignored
+
+        l_min : int
+            Minimum diagonal line length
+
+        v_min : int
+            Minimum vertical line length
+
+        Returns
+        -------
+
+        res : dict
+            Dictionary mapping each measure to its value
+
+        See also
+        --------
+
+        ammonyte.utils.rqa.rqa_measures
+
+        ammonyte.utils.rqa.matrix_line_histograms
+        '''
+
+        measures = MEASURES if measures is None else measures
+
+        diagonal, vertical = matrix_line_histograms(self.matrix,theiler=theiler)
+        rates = matrix_diagonal_rates(self.matrix) if 'TREND' in measures else None
+
+        return rqa_measures(diagonal,vertical,rates,measures=measures,theiler=theiler,l_min=l_min,v_min=v_min)
+
+    def laplacian_eigenmaps(self,w_size, w_incre, n_components=4, eigen_solver='full'):
         '''Function to run regime change detection workflow
         
         Parameters
@@ -37,29 +102,77 @@ class RecurrenceMatrix:
         w_incre : int 
             Window increment for the fisher information 
 
+        n_components : int
+            Number of non-trivial eigenvectors passed to the fisher information calculation
+
+        eigen_solver : str; {'full','subset','arpack'}
+            How to solve the generalized eigenproblem L v = lambda D v.
+
+            - 'full' solves for the full spectrum with scipy.linalg.eigh and stores every eigenvector
+            - 'subset' solves only for the n_components+1 smallest eigenpairs with scipy.linalg.eigh(subset_by_index)
+            - 'arpack' solves the equivalent normalized problem with scipy.sparse.linalg.eigsh. The weight matrix
+              is applied as an operator, so sparse recurrence matrices are never densified.
+
+            With 'subset' and 'arpack' only the first n_components+1 eigenvectors (including the trivial one)
+            are stored on the result's eigenmap.
+
         Returns
         -------
 
         FI_series : pyleoclim.Series object
+
+        See also
+        --------
+
+        scipy.linalg.eigh
+
+        scipy.sparse.linalg.eigsh
         
         '''
-        W = self.matrix + 1
+        n = self.matrix.shape[0]
 
-        D = np.zeros(W.shape)
+        if n_components+1 > n:
+            raise ValueError(f'n_components must be smaller than the number of points in the matrix ({n})')
 
-        for i in range(len(W)):
-            D[i,i] = np.sum(W[:,i])
-            
-        L = D - W
+        if eigen_solver in ('full','subset'):
 
-        _, eigvec = sp.linalg.eigh(L,D)
-        
-        eig_data = []
+            if self.issparse:
+                W = self.matrix.toarray() + 1
+            else:
+                W = self.matrix + 1
 
-        for idx, i in enumerate(self.time):
-            eig_data.append([i,eigvec[idx,1],eigvec[idx,2],eigvec[idx,3],eigvec[idx,4]])
-            
-        time,value = fisher_information(eig_data,w_size,w_incre)
+            D = np.diag(np.sum(W,axis=0,dtype=float))
+                
+            L = D - W
+
+            if eigen_solver == 'full':
+                _, eigvec = sp.linalg.eigh(L,D)
+            else:
+                _, eigvec = sp.linalg.eigh(L,D,subset_by_index=[0,n_components])
+
+        elif eigen_solver == 'arpack':
+
+            #W = A + 1 so the smallest eigenpairs of L v = lambda D v are the largest of
+            #D^-1/2 W D^-1/2 u = (1-lambda) u, with v = D^-1/2 u
+            A = self.matrix
+            degree = np.asarray(A.sum(axis=0),dtype=float).ravel() + n
+            scale = 1/np.sqrt(degree)
+
+            def matvec(x):
+                x = scale*np.ravel(x)
+                return scale*(A @ x + np.sum(x))
+
+            M = LinearOperator((n,n),matvec=matvec,dtype=float)
+            v0 = np.random.RandomState(seed=42).uniform(size=n)
+            eigval, eigvec = eigsh(M,k=n_components+1,which='LA',v0=v0)
+
+            order = np.argsort(eigval)[::-1]
+            eigvec = scale[:,None]*eigvec[:,order]
+
+        else:
+            raise ValueError(f'Eigen solver "{eigen_solver}" is not recognized. Please use one of full, subset or arpack')
+        
+        time,value = fisher_information(eigvec[:,1:n_components+1],w_size,w_incre,time=self.time)
         
         FI_series = RQARes(time=time,
                             value=value,
@@ -79,8 +192,11 @@ class RecurrenceMatrix:
         
         return FI_series
 
-    def plot(self,figsize=(8,8),xlabel=None,ylabel=None,title=None,imshow_kwargs=None):
+    def plot(self,figsize=(8,8),xlabel=None,ylabel=None,title=None,imshow_kwargs=None,scatter_kwargs=None):
         '''Plotting function for recurrence matrices
+
+        Dense matrices are drawn with imshow, sparse matrices are drawn by scattering their recurrent points
+        so the full matrix never has to be materialised.
         
         Parameters
         ----------
@@ -100,10 +216,15 @@ class RecurrenceMatrix:
         imshow_kwargs : dict
             Dictionary of key word arguments for the imshow method from matplotlib.axes.Axes.imshow
 
+        scatter_kwargs : dict
+            Dictionary of key word arguments for the scatter method from matplotlib.axes.Axes.scatter. Only used for sparse matrices
+
         See also
         --------
 
         matplotlib.axes.Axes.imshow
+
+        matplotlib.axes.Axes.scatter
         '''
 
         fig, ax = plt.subplots(figsize = figsize)
@@ -134,7 +255,26 @@ class RecurrenceMatrix:
 
         ax.set_title(title)
 
-        ax.imshow(self.matrix,**imshow_kwargs)
+        if self.issparse:
+            scatter_kwargs={} if scatter_kwargs is None else scatter_kwargs.copy()
+
+            if 'color' not in scatter_kwargs:
+                scatter_kwargs['color'] = 'k'
+
+            if 'marker' not in scatter_kwargs:
+                scatter_kwargs['marker'] = ','
+
+            if 's' not in scatter_kwargs:
+                scatter_kwargs['s'] = 1
+
+            time = np.asarray(self.time)
+            row, col = self.matrix.nonzero()
+            ax.scatter(time[col],time[row],**scatter_kwargs)
+            ax.set_xlim(time[0],time[-1])
+            ax.set_ylim(time[0],time[-1])
+            ax.set_aspect('equal')
+        else:
+            ax.imshow(self.matrix,**imshow_kwargs)
 
         if 'fig' in locals():
             return fig, ax
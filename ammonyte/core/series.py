@@ -8,17 +8,11 @@ import pyleoclim as pyleo
 import numpy as np
 
 from tqdm import tqdm
-from pyrqa.time_series import TimeSeries
-from pyrqa.settings import Settings
-from pyrqa.analysis_type import Classic
-from pyrqa.neighbourhood import FixedRadius
-from pyrqa.metric import EuclideanMetric
-from pyrqa.computation import RQAComputation
 
 from ..core.rqa_res import RQARes
 from ..core.time_embedded_series import TimeEmbeddedSeries
 from ..core.recurrence_matrix import RecurrenceMatrix
-from ..utils.parameters import tau_search
+from ..utils.rqa import sliding_windows, windowed_rqa
 
 class Series(pyleo.Series):
     '''Ammonyte series object, launching point for most ammonyte analysis.
@@ -27,35 +21,42 @@ class Series(pyleo.Series):
     defined here.
     '''
 
-    def embed(self,m,tau=None,):
-        '''Function to create a time delay embedding from a ammonyte.series object'''
+    def embed(self,m,tau=None,copy=False):
+        '''Function to create a time delay embedding from a ammonyte.series object
 
-        if tau is None:
-            tau = tau_search(self)
+        Parameters
+        ----------
 
-        values = self.value
-        time_axis = self.time[:(-m*tau)]
-        
-        manifold = np.ndarray(shape = (len(values)-(m*tau),m))
+        m : int
+            Embedding dimension
 
-        for idx, _ in enumerate(values):
-            if idx < (len(values)-(m*tau)):
-                manifold[idx] = values[idx:idx+(m*tau):tau]
+        tau : int
+            Embedding delay, will be calculated according to first minimum of mutual information if not passed
+
+        copy : bool; {True,False}
+            Whether to store the embedding as a writable contiguous array instead of a read-only view of the series values
+
+        Returns
+        -------
 
-        embedded_data = manifold
-        embedded_time = time_axis
+        td : ammonyte.TimeEmbeddedSeries
+
+        See also
+        --------
+
+        ammonyte.utils.embedding.time_delay_embed
+        '''
 
         return TimeEmbeddedSeries(
             series=self,
             m=m,
             tau=tau,
-            embedded_data=embedded_data,
-            embedded_time=embedded_time,
             value_name=self.value_name,
             value_unit=self.value_unit,
             time_name=self.time_name,
             time_unit=self.time_unit,
-            label=self.label)
+            label=self.label,
+            copy=copy)
 
     def determinism(self,window_size,overlap,m,tau,eps):
         '''Calculate determinism of a series
@@ -90,51 +91,7 @@ class Series(pyleo.Series):
             Ammonyte.Series object containing time series of the determinism statistic
         '''
        
-        series = self
-        windows = np.arange(int(min(series.time)),int(max(series.time)),int(overlap/2))
-
-        cutoff_index = -int(window_size/(overlap/2))
-
-        res = []
-        window_time = []
-
-        for window in tqdm(windows[:cutoff_index]):
-            
-            series_slice = series.slice((window,window+window_size))
-
-            window_values = series_slice.value
-            time = series_slice.time[int((len(series_slice.time)-1)/2)]
-
-            ts = TimeSeries(window_values,
-                            embedding_dimension = m,
-                            time_delay=tau)
-
-            settings = Settings(ts,
-                                analysis_type=Classic,
-                                neighbourhood=FixedRadius(eps),
-                                similarity_measure=EuclideanMetric)
-
-            computation = RQAComputation.create(settings,
-                                                verbose=False)
-            
-            result = computation.run()
-
-            window_time.append(time)
-
-            res.append(result.determinism)
-
-        det_series = RQARes(
-            time = window_time,
-            value = res,
-            time_name=series.time_name,
-            time_unit=series.time_unit,
-            value_name='DET',
-            label=series.label,
-            m = m,
-            tau = tau,
-            eps = eps)
-
-        return det_series
+        return self.rqa_windowed(window_size,overlap,m,tau,eps,measures=['DET'])['DET']
 
     def laminarity(self,window_size,overlap,m,tau,eps):
         '''Calculate laminarity of a series
@@ -169,49 +126,86 @@ class Series(pyleo.Series):
             Ammonyte.Series object containing time series of the laminarity statistic
         '''
 
-        series = self
-        windows = np.arange(int(min(series.time)),int(max(series.time)),int(overlap/2))
+        return self.rqa_windowed(window_size,overlap,m,tau,eps,measures=['LAM'])['LAM']
 
-        cutoff_index = -int(window_size/(overlap/2))
+    def rqa_windowed(self,window_size,overlap,m,tau,eps,measures=('DET','LAM'),theiler=1,l_min=2,v_min=2):
+        '''Calculate several recurrence quantification measures of a series over sliding windows in a single pass
 
-        res = []
-        window_time = []
+        The recurrence matrix band shared by overlapping windows is computed once, and every requested measure
+        is derived from one diagonal and one vertical line length histogram per window.
 
-        for window in tqdm(windows[:cutoff_index]):
-            
-            series_slice = series.slice((window,window+window_size))
+        Note that series must be evenly spaced for this method.
+        See interp, bin, and gkernel methods in parent class pyleoclim.Series for details.
 
-            window_values = series_slice.value
-            time = series_slice.time[int((len(series_slice.time)-1)/2)]
+        Parameters
+        ----------
 
-            ts = TimeSeries(window_values,
-                            embedding_dimension = m,
-                            time_delay=tau)
+        window_size : int
+            Size of window to use when calculating recurrence plots.
+            Note this is in units of the time axis.
 
-            settings = Settings(ts,
-                                analysis_type=Classic,
-                                neighbourhood=FixedRadius(eps),
-                                similarity_measure=EuclideanMetric)
+        overlap : int
+            Amount of overlap to allow between windows
+            Note this is in units of the time axis.
 
-            computation = RQAComputation.create(settings,
-                                                verbose=False)
-            
-            result = computation.run()
+        m : int
+            Embedding dimension to use when performing time delay embedding,
+
+        tau : int
+            Time delay to use when performing time delay embedding
+
+        eps : float
+            Size of radius to use to calculate recurrence matrix
+
+        measures : list
+            Measures to calculate. Any of 'RR', 'DET', 'L', 'Lmax', 'ENTR', 'LAM', 'TT', 'Vmax' and 'TREND'.
+            See ammonyte.utils.rqa.rqa_measures for details
+
+        theiler : int
+            Theiler window. Diagonals closer than theiler to the main diagonal are excluded from diagonal measures
+
+        l_min : int
+            Minimum diagonal line length
+
+        v_min : int
+            Minimum vertical line length
+
+        Returns
+        -------
+
+        res : dict
+            Dictionary mapping each measure to an ammonyte.RQARes object containing its time series
+
+        See also
+        --------
+
+        ammonyte.utils.rqa.windowed_rqa
+        '''
+
+        series = self
+        windows = sliding_windows(series.time,window_size,overlap)
+        window_res = windowed_rqa(series.value,windows,m,tau,eps,measures,theiler,l_min,v_min)
+
+        res = {measure:[] for measure in measures}
+        window_time = []
+
+        for (start,stop),values in tqdm(zip(windows,window_res),total=len(windows)):
+
+            time = series.time[start+int((stop-start-1)/2)]
 
             window_time.append(time)
 
-            res.append(result.laminarity)
-
-        lam_series = RQARes(
-            time=window_time,
-            value=res,
-            time_name=series.time_name,
-            time_unit=series.time_unit,
-            value_name='LAM',
-            label=series.label,
-            m = m,
-            tau = tau,
-            eps = eps)
-        
-        return lam_series
+            for measure in measures:
+                res[measure].append(values[measure])
+
+        return {measure:RQARes(
+                    time=window_time,
+                    value=res[measure],
+                    time_name=series.time_name,
+                    time_unit=series.time_unit,
+                    value_name=measure,
+                    label=series.label,
+                    m = m,
+                    tau = tau,
+                    eps = eps) for measure in measures}
 
@@ -1,23 +1,17 @@
 #!/usr/bin/env python3
 # -*- coding: utf-8 -*-
-import itertools
 
 import pyleoclim as pyleo
 import numpy as np
 import pandas as pd
-import multiprocessing as mp
-
-from pyrqa.time_series import EmbeddedSeries
-from pyrqa.settings import Settings
-from pyrqa.analysis_type import Classic
-from pyrqa.neighbourhood import FixedRadius
-from pyrqa.metric import EuclideanMetric
-from pyrqa.computation import RPComputation
 
 from ..core.recurrence_matrix import RecurrenceMatrix
 from ..core.recurrence_network import RecurrenceNetwork
 from ..utils.parameters import tau_search
 from ..utils.range_finder import range_finder
+from ..utils.distance import recurrence_matrix, recurrence_family, recurrence_density, epsilon_from_density
+from ..utils.parallel import shared_pool, shared_call, default_processes
+from ..utils.embedding import time_delay_embed
 
 
 class TimeEmbeddedSeries:
@@ -52,9 +46,13 @@ class TimeEmbeddedSeries:
 
     label : str
         Label for embedding
+
+    copy : bool; {True,False}
+        Whether to store the embedding as a writable contiguous array. By default embedded_data is a
+        read-only strided view of the series values. See ammonyte.utils.embedding.time_delay_embed
     '''
 
-    def __init__(self,series,m,tau=None,embedded_data=None,embedded_time=None,value_name=None,value_unit=None,time_name=None,time_unit=None,label=None):
+    def __init__(self,series,m,tau=None,embedded_data=None,embedded_time=None,value_name=None,value_unit=None,time_name=None,time_unit=None,label=None,copy=False):
         self.series = series
         self.m = m
         self.tau = tau
@@ -84,14 +82,8 @@ class TimeEmbeddedSeries:
 
             else:
                 raise ValueError('Unrecognized data type. Please pass a pyleoclim Series or pandas Series type object')
-            
-            manifold = np.ndarray(shape = (len(values)-(self.m*self.tau),self.m))
 
-            for idx, i in enumerate(values):
-                if idx < (len(values)-(self.m*self.tau)):
-                    manifold[idx] = values[idx:idx+(self.m*self.tau):self.tau]
-
-            self.embedded_data = manifold
+            self.embedded_data = time_delay_embed(values,self.m,self.tau,copy=copy)
             self.embedded_time = time_axis
 
         if self.value_name is None:
@@ -109,7 +101,7 @@ class TimeEmbeddedSeries:
         if self.label is None:
             self.label = self.series.label
 
-    def create_recurrence_matrix(self,epsilon):
+    def create_recurrence_matrix(self,epsilon,backend=None,sparse=False):
         '''Function to create Recurrence Matrix object
         
         Parameters
@@ -118,24 +110,20 @@ class TimeEmbeddedSeries:
         epsilon : float
             Fixed radius used to calculate whether two points are recurrent
             
+        backend : str; {'numpy','pyrqa'}
+            Engine used to compute the matrix. If None, PyRQA is used when an OpenCL device is available
+            and the native numpy engine otherwise. See ammonyte.utils.distance.recurrence_matrix for details
+
+        sparse : bool; {True,False}
+            Whether to store the matrix in scipy.sparse CSR format. The sparse matrix is built from a neighbour
+            search, so the dense matrix is never materialised. Not available with the pyrqa backend
+            
         Returns
         -------
         
         RecurrenceMatrix : ammonyte.RecurrenceMatrix object'''
 
-        ts = EmbeddedSeries(self.embedded_data)
-
-        settings = Settings(ts,
-                            analysis_type=Classic,
-                            neighbourhood=FixedRadius(epsilon),
-                            similarity_measure=EuclideanMetric)
-
-        computation = RPComputation.create(settings,
-                                        verbose=False)
-
-        result = computation.run()
-
-        matrix = result.recurrence_matrix
+        matrix = recurrence_matrix(self.embedded_data,epsilon,backend=backend,sparse=sparse)
 
         return RecurrenceMatrix(
             matrix=matrix,
@@ -150,7 +138,7 @@ class TimeEmbeddedSeries:
             time_unit=self.time_unit,
             label=self.label)
 
-    def create_recurrence_network(self,epsilon):
+    def create_recurrence_network(self,epsilon,backend=None,sparse=False):
         '''Function to create Recurrence Network object
         
         Parameters
@@ -159,24 +147,20 @@ class TimeEmbeddedSeries:
         epsilon : float
             Fixed radius used to calculate whether two points are recurrent.
             
+        backend : str; {'numpy','pyrqa'}
+            Engine used to compute the matrix. If None, PyRQA is used when an OpenCL device is available
+            and the native numpy engine otherwise. See ammonyte.utils.distance.recurrence_matrix for details
+
+        sparse : bool; {True,False}
+            Whether to store the matrix in scipy.sparse CSR format. The sparse matrix is built from a neighbour
+            search, so the dense matrix is never materialised. Not available with the pyrqa backend
+            
         Returns
         -------
         
         RecurrenceNetwork : ammonyte.RecurrenceNetwork object'''
 
-        ts = EmbeddedSeries(self.embedded_data)
-
-        settings = Settings(ts,
-                            analysis_type=Classic,
-                            neighbourhood=FixedRadius(epsilon),
-                            similarity_measure=EuclideanMetric)
-
-        computation = RPComputation.create(settings,
-                                        verbose=False)
-
-        result = computation.run()
-
-        matrix = result.recurrence_matrix
+        matrix = recurrence_matrix(self.embedded_data,epsilon,backend=backend,sparse=sparse)
 
         return RecurrenceNetwork(
             matrix=matrix,
@@ -189,13 +173,101 @@ class TimeEmbeddedSeries:
             time_unit=self.time_unit,
             label=self.label)
 
-    def find_epsilon(self,eps,target_density=.05,tolerance=.01,initial_density=None,parallelize=False,num_processes=None,amp=10,verbose=True):
+    def recurrence_family(self,epsilons,output='matrix',lazy=False,sparse=False,measures=None,theiler=1,l_min=2,v_min=2):
+        '''Function to create recurrence matrices, densities or RQA measures for several epsilon values at once
+
+        Distances between embedded points are only computed once for the whole family, see
+        ammonyte.utils.distance.recurrence_family. Results are identical to calling create_recurrence_matrix
+        with the numpy backend for each epsilon.
+
+        Parameters
+        ----------
+
+        epsilons : list
+            Fixed radii used to calculate whether two points are recurrent
+
+        output : str; {'matrix','density','rqa'}
+            What to return for each epsilon: an ammonyte.RecurrenceMatrix object, its density, or a dictionary of its RQA measures
+
+        lazy : bool; {True,False}
+            Whether to return a generator that builds each result when it is requested, so only one recurrence matrix
+            is held in memory at a time, instead of a list
+
+        sparse : bool; {True,False}
+            Whether to build the family from a neighbour search within the largest epsilon, storing matrices in
+            scipy.sparse CSR format
+
+        measures : list
+            RQA measures to calculate when output is 'rqa'. See ammonyte.RecurrenceMatrix.rqa
+
+        theiler : int
+            Theiler window used when output is 'rqa'
+
+        l_min : int
+            Minimum diagonal line length used when output is 'rqa'
+
+        v_min : int
+            Minimum vertical line length used when output is 'rqa'
+
+        Returns
+        -------
+
+        family : list or generator
+            One result per epsilon, in the order of epsilons
+
+        See also
+        --------
+
+        ammonyte.utils.distance.recurrence_family
+
+        ammonyte.RecurrenceMatrix.rqa
+        '''
+
+        if output not in ('matrix','density','rqa'):
+            raise ValueError(f'Output "{output}" is not recognized. Please use one of matrix, density or rqa')
+
+        epsilons = list(epsilons)
+
+        def family():
+            matrices = recurrence_family(self.embedded_data,epsilons,output='density' if output == 'density' else 'matrix',sparse=sparse)
+
+            for epsilon, matrix in zip(epsilons,matrices):
+                if output == 'density':
+                    yield matrix
+                    continue
+
+                rm = RecurrenceMatrix(
+                    matrix=matrix,
+                    time=self.embedded_time,
+                    epsilon=epsilon,
+                    series=self.series,
+                    m = self.m,
+                    tau = self.tau,
+                    value_name=self.value_name,
+                    value_unit=self.value_unit,
+                    time_name=self.time_name,
+                    time_unit=self.time_unit,
+                    label=self.label)
+
+                if output == 'rqa':
+                    yield rm.rqa(measures=measures,theiler=theiler,l_min=l_min,v_min=v_min)
+                else:
+                    yield rm
+
+        return family() if lazy else list(family())
+
+    def find_epsilon(self,eps=None,target_density=.05,tolerance=.01,initial_density=None,parallelize=False,num_processes=None,amp=10,verbose=True,backend=None,sparse=False,method='exact',sample_size=None,seed=None):
         '''Function to find epsilon value given target recurrence matrix density
+
+        By default epsilon is solved for directly: the density at a given epsilon is the fraction of pairwise
+        distances below it, so the smallest epsilon reaching target_density is an order statistic of the pairwise
+        distances. See ammonyte.utils.distance.epsilon_from_density. The trial and error search is still available
+        with method='iterative'
         
         Parameters
         ----------
         eps : float
-            Starting epsilon value (best guess)
+            Starting epsilon value (best guess). Only used by the iterative search
         target_density : float
             Desired recurrence matrix density
         tolerance : float
@@ -203,32 +275,65 @@ class TimeEmbeddedSeries:
         initial_density : float
             If you've already calculated the initial density for your settings you can pass it here to save computation time
         parallelize : bool; {True,False}
-            Whether or not to parallelize the search process. Currently only tested on macOS, could be issues running this on Windows.
+            Whether or not to parallelize the iterative search. One process pool is kept for the whole search, the embedding
+            is shared with it through shared memory, and each worker returns the density of one trial epsilon.
         num_processes : int
             Number of processes to run, automatically set to your cpu count
         amp : int
             The amplitude of the range of epsilon value search. Higher values cover ground quickly but converge slowly, the opposite is true for lower values
         verbose : bool; {True,False}
             Whether or not to print output after each iteration
+        backend : str; {'numpy','pyrqa'}
+            Engine used to compute each trial recurrence matrix. See ammonyte.utils.distance.recurrence_matrix for details
+        sparse : bool; {True,False}
+            Whether to build the recurrence matrices in scipy.sparse CSR format
+        method : str; {'exact','sampled','iterative'}
+            How to find epsilon.
+
+            - 'exact' selects the order statistic of all pairwise distances, giving the target density up to ties
+            - 'sampled' estimates it from sample_size random pairs of points, for series too long to hold every pairwise distance
+            - 'iterative' searches by building trial recurrence matrices, starting from eps, until the density is within tolerance
+        sample_size : int
+            Number of random pairs of points used by the sampled method. Defaults to 100000
+        seed : int
+            Seed for the random number generator used by the sampled method
         Returns
         -------
-        epsilon : float
-            Epsilon value that produces desired recurrence density within tolerance value provided.
+        results : dict
+            Dictionary with the epsilon value ('Epsilon') and the recurrence matrix it produces ('Output').
+            The exact and sampled methods also return a bound on the difference between the density and the target ('Error')
         See also
         --------
-        ammonyte.utils.rm_search
+        ammonyte.utils.distance.epsilon_from_density
         '''
 
+        if method in ('exact','sampled'):
+
+            if method == 'sampled' and sample_size is None:
+                sample_size = 100000
+
+            eps, error = epsilon_from_density(self.embedded_data,target_density,sample_size=sample_size if method == 'sampled' else None,seed=seed)
+            results = {'Epsilon':eps,'Output':self.create_recurrence_matrix(eps,backend,sparse),'Error':error}
+
+            if verbose:
+                density = results['Output'].density
+                print(f'Epsilon: {eps:.4f}, Density: {density:.4f}.')
+
+            return results
+
+        elif method != 'iterative':
+            raise ValueError(f'Method "{method}" is not recognized. Please use one of exact, sampled or iterative')
+
+        if eps is None:
+            raise ValueError('The iterative search needs a starting epsilon value')
+
         if num_processes is None:
-            if mp.cpu_count() > 2:
-                num_processes = mp.cpu_count() - 2
-            else:
-                num_processes = 1
+            num_processes = default_processes()
         
         if initial_density is None:
 
-            initial_result = self.create_recurrence_matrix(eps)
-            initial_density = np.sum(initial_result.matrix)/np.size(initial_result.matrix)
+            initial_result = self.create_recurrence_matrix(eps,backend,sparse)
+            initial_density = initial_result.density
 
             if verbose:
                 print(f'Initial density is {initial_density:.4f}')
@@ -248,41 +353,35 @@ class TimeEmbeddedSeries:
 
         if parallelize:
 
-            while True:
+            #The embedding is shared with one pool for the whole search, and workers only send back densities
+            with shared_pool(num_processes,embedded_data=np.asarray(self.embedded_data)) as pool:
+
+                while True:
 
-                with mp.Pool(num_processes) as pool:
-                    
                     eps_range, flag = range_finder(eps,density,target_density,tolerance,num_processes,amp)
-                    
+
                     if flag is True:
-                        
-                        eps = eps_range
-                        results = {'Epsilon':eps,'Output':self.create_recurrence_matrix(eps)}
+
+                        results = {'Epsilon':eps,'Output':self.create_recurrence_matrix(eps,backend,sparse)}
 
                         if verbose:
-                            matrix = results['Output'].matrix
-                            density = np.sum(matrix)/np.size(matrix)
+                            density = results['Output'].density
                             print(f'Epsilon: {eps:.4f}, Density: {density:.4f}.')
 
                         return results
 
-                    r = pool.starmap(self.create_recurrence_matrix, zip(eps_range))
-                    
-                    pool.close()
-                    pool.join()
+                    eps_range = np.maximum(eps_range,0)
+                    densities = pool.starmap(shared_call,[(recurrence_density,('embedded_data',),new_eps) for new_eps in eps_range])
 
-                for item in r:
-                    matrix = item.matrix
-                    new_eps = item.epsilon
-                    new_density = np.sum(matrix)/np.size(matrix)
+                    for new_eps,new_density in zip(eps_range,densities):
 
-                    if np.abs(new_density - .05) < np.abs(density -.05):
-                        density = new_density
-                        eps = new_eps
+                        if np.abs(new_density - target_density) < np.abs(density - target_density):
+                            density = new_density
+                            eps = float(new_eps)
 
-                if verbose:
-        
-                    print(f'Epsilon: {eps:.4f}, Density: {density:.4f}.')
+                    if verbose:
+
+                        print(f'Epsilon: {eps:.4f}, Density: {density:.4f}.')
         
         else:
             low_modifier=1
@@ -293,20 +392,18 @@ class TimeEmbeddedSeries:
 
                 if np.abs(distance) <= tolerance:
                         
-                        results = {'Epsilon':eps,'Output':self.create_recurrence_matrix(eps)}
+                        results = {'Epsilon':eps,'Output':self.create_recurrence_matrix(eps,backend,sparse)}
 
                         if verbose:
-                            matrix = results['Output'].matrix
-                            density = np.sum(matrix)/np.size(matrix)
+                            density = results['Output'].density
                             print(f'Epsilon: {eps:.4f}, Density: {density:.4f}.')
 
                         return results
 
                 new_eps = max(0,eps+(amp*distance*low_modifier*high_modifier))
-                trial = self.create_recurrence_matrix(new_eps)
-                matrix = trial.matrix
+                trial = self.create_recurrence_matrix(new_eps,backend,sparse)
                 new_eps = trial.epsilon
-                new_density = np.sum(matrix)/np.size(matrix)
+                new_density = trial.density
                 new_distance = target_density - new_density
 
                 if np.abs(new_distance) < np.abs(distance):
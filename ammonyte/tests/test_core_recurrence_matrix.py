@@ -35,4 +35,61 @@ class TestCoreRecurrenceMatrixLaplacianEigenmaps:
         ts_normal = gen_normal()
         td_sst = ts_normal.embed(3,1)
         rm_sst = td_sst.create_recurrence_matrix(1) 
-        rm_sst.laplacian_eigenmaps(w_size=50,w_incre=5,)
\ No newline at end of file
+        rm_sst.laplacian_eigenmaps(w_size=50,w_incre=5,)
+    def test_laplacian_eigenmaps_t1(self):
+        '''Test that sparse and dense matrices give the same result'''
+        ts_normal = gen_normal()
+        td_sst = ts_normal.embed(3,1)
+        res_dense = td_sst.create_recurrence_matrix(1,backend='numpy').laplacian_eigenmaps(w_size=50,w_incre=5)
+        res_sparse = td_sst.create_recurrence_matrix(1,sparse=True).laplacian_eigenmaps(w_size=50,w_incre=5)
+        assert np.allclose(res_dense.value,res_sparse.value)
+
+    @pytest.mark.parametrize('eigen_solver,sparse',[('subset',False),('arpack',False),('arpack',True)])
+    def test_laplacian_eigenmaps_t2(self,eigen_solver,sparse):
+        '''Test that partial eigensolvers match the full solve and only store n_components+1 vectors'''
+        ts_normal = gen_normal()
+        td_sst = ts_normal.embed(3,1)
+        res_full = td_sst.create_recurrence_matrix(1,backend='numpy').laplacian_eigenmaps(w_size=50,w_incre=5)
+        rm_sst = td_sst.create_recurrence_matrix(1,backend='numpy',sparse=sparse)
+        res_partial = rm_sst.laplacian_eigenmaps(w_size=50,w_incre=5,n_components=4,eigen_solver=eigen_solver)
+        assert res_partial.eigenmap.shape == (len(rm_sst.time),5)
+        assert np.allclose(res_full.value,res_partial.value)
+
+class TestCoreRecurrenceMatrixDensity:
+    '''Tests for density property'''
+
+    def test_density_t0(self):
+        ts_normal = gen_normal()
+        td_sst = ts_normal.embed(3,1)
+        rm_dense = td_sst.create_recurrence_matrix(1,backend='numpy')
+        rm_sparse = td_sst.create_recurrence_matrix(1,sparse=True)
+        assert rm_sparse.issparse and not rm_dense.issparse
+        assert rm_dense.density == rm_sparse.density
+
+class TestCoreRecurrenceMatrixPlot:
+    '''Tests for plot function'''
+
+    @pytest.mark.parametrize('sparse',[True,False])
+    def test_plot_t0(self,sparse):
+        ts_normal = gen_normal()
+        td_sst = ts_normal.embed(3,1)
+        rm_sst = td_sst.create_recurrence_matrix(1,backend='numpy',sparse=sparse)
+        rm_sst.plot()
+
+class TestCoreRecurrenceMatrixRQA:
+    '''Tests for rqa function'''
+
+    def test_rqa_t0(self):
+        '''Test that dense and sparse matrices give the same measures'''
+        ts_normal = gen_normal()
+        td_sst = ts_normal.embed(3,1)
+        res_dense = td_sst.create_recurrence_matrix(1,backend='numpy').rqa()
+        res_sparse = td_sst.create_recurrence_matrix(1,sparse=True).rqa()
+        assert list(res_dense.keys()) == list(amt.utils.rqa.MEASURES)
+        assert np.allclose(list(res_dense.values()),list(res_sparse.values()),equal_nan=True)
+
+    def test_rqa_t1(self):
+        ts_normal = gen_normal()
+        td_sst = ts_normal.embed(3,1)
+        res = td_sst.create_recurrence_matrix(1,backend='numpy').rqa(measures=['DET','LAM'],theiler=2,l_min=3,v_min=3)
+        assert list(res.keys()) == ['DET','LAM']
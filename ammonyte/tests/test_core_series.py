@@ -58,4 +58,19 @@ class TestCoreSeriesLaminarity:
 
         ts = gen_normal()
 
-        ts.laminarity(window_size,overlap,m,tau,radius)
\ No newline at end of file
+        ts.laminarity(window_size,overlap,m,tau,radius)
+
+class TestCoreSeriesRQAWindowed:
+    '''Tests for rqa_windowed function'''
+
+    @pytest.mark.parametrize('window_size,overlap,radius,m,tau',[(10,5,1,5,2),(30,6,1.2,2,3)])
+    def test_rqa_windowed_t0(self,window_size,overlap,m,tau,radius):
+        '''Test that single pass measures match the dedicated methods'''
+
+        ts = gen_normal()
+
+        res = ts.rqa_windowed(window_size,overlap,m,tau,radius,measures=['RR','DET','LAM','TT','TREND'])
+
+        assert set(res.keys()) == {'RR','DET','LAM','TT','TREND'}
+        assert np.array_equal(res['DET'].value,ts.determinism(window_size,overlap,m,tau,radius).value,equal_nan=True)
+        assert np.array_equal(res['LAM'].value,ts.laminarity(window_size,overlap,m,tau,radius).value,equal_nan=True)
@@ -44,6 +44,14 @@ class TestCoreTimeEmbeddSeriesCreateRecurrenceMatrix:
 
         td_sst.create_recurrence_matrix(1)
 
+    @pytest.mark.parametrize('backend',['numpy',None])
+    def test_create_recurrence_matrix_t1(self,backend):
+        ts_normal = gen_normal()
+
+        td_sst = ts_normal.embed(3,3)
+
+        td_sst.create_recurrence_matrix(1,backend=backend)
+
 class TestCoreTimeEmbeddSeriesCreateRecurrenceNetwork:
     '''Tests for create_recurrence_network
     '''
@@ -65,4 +73,52 @@ class TestCoreTimeEmbeddSeriesFindEpsiilon:
 
         td = ts_normal.embed(3,1)
 
-        td.find_epsilon(eps,parallelize=False)
\ No newline at end of file
+        td.find_epsilon(eps,parallelize=False)
+    def test_find_eps_t1(self):
+        '''Test that the exact solver reaches the target density with the smallest possible epsilon'''
+        ts_normal = gen_normal()
+
+        td = ts_normal.embed(3,1)
+
+        res = td.find_epsilon(target_density=.1,verbose=False)
+        smaller = td.create_recurrence_matrix(float(np.nextafter(np.float32(res['Epsilon']),np.float32(0))),backend='numpy')
+        assert res['Output'].density >= .1 > smaller.density
+
+    @pytest.mark.parametrize('method',['sampled','iterative'])
+    def test_find_eps_t2(self,method):
+        ts_normal = gen_normal()
+
+        td = ts_normal.embed(3,1)
+
+        res = td.find_epsilon(1,target_density=.1,method=method,seed=42,verbose=False)
+        assert np.abs(res['Output'].density - .1) <= max(res.get('Error',0),.01)
+
+    def test_find_eps_t3(self):
+        '''Test the parallel iterative search against a target other than .05'''
+        ts_normal = gen_normal()
+
+        td = ts_normal.embed(3,1)
+
+        res = td.find_epsilon(1,target_density=.2,method='iterative',parallelize=True,num_processes=2,verbose=False)
+        assert np.abs(res['Output'].density - .2) <= .01
+
+class TestCoreTimeEmbeddSeriesRecurrenceFamily:
+    '''Tests for recurrence_family
+    '''
+    @pytest.mark.parametrize('sparse',[True,False])
+    def test_recurrence_family_t0(self,sparse):
+        ts_normal = gen_normal()
+
+        td = ts_normal.embed(3,1)
+        epsilons = [.5,1,2]
+
+        family = td.recurrence_family(epsilons,sparse=sparse)
+        densities = td.recurrence_family(epsilons,output='density',sparse=sparse)
+        measures = td.recurrence_family(epsilons,output='rqa',lazy=True,sparse=sparse)
+
+        assert not isinstance(measures,list)
+        for eps,rm,density,res in zip(epsilons,family,densities,measures):
+            single = td.create_recurrence_matrix(eps,backend='numpy')
+            assert rm.epsilon == eps
+            assert rm.density == density == single.density
+            assert np.allclose(list(res.values()),list(single.rqa().values()),equal_nan=True)
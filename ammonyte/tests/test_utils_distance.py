@@ -0,0 +1,133 @@
+''' Tests for ammonyte.utils.distance
+Naming rules:
+1. class: Test{filename}{Class}{method} with appropriate camel case
+2. function: test_{method}_t{test_id}
+
+Notes on how to test:
+0. Make sure [pytest](https://docs.pytest.org) has been installed: `pip install pytest`
+1. execute `pytest {directory_path}` in terminal to perform all tests in all testing files inside the specified directory
+    (certain tests will only work when run from the tests directory, so make sure to run from there!)
+2. execute `pytest {file_path}` in terminal to perform all tests in the specified file
+3. execute `pytest {file_path}::{TestClass}::{test_method}` in terminal to perform a specific test class/method inside the specified file
+4. after `pip install pytest-xdist`, one may execute "pytest -n 4" to test in parallel with number of workers specified by `-n`
+5. for more details, see https://docs.pytest.org/en/stable/usage.html
+'''
+
+import pytest
+import ammonyte as amt
+import numpy as np
+
+from ..utils.distance import recurrence_matrix, sparse_recurrence_matrix, recurrence_family, recurrence_density, epsilon_from_density, opencl_available
+
+def gen_normal(loc=0, scale=1, nt=100):
+    ''' Generate random data with a Gaussian distribution
+    '''
+    t = np.arange(nt)
+    np.random.seed(42)
+    v = np.random.normal(loc=loc, scale=scale, size=nt)
+    ts = amt.Series(t,v)
+    return ts
+
+class TestUtilsDistanceRecurrenceMatrix:
+    '''Tests for recurrence_matrix function'''
+
+    @pytest.mark.parametrize('eps,block_size',[(.5,7),(1,512)])
+    def test_recurrence_matrix_t0(self,eps,block_size):
+        '''Test that the numpy backend is symmetric and matches a brute force computation'''
+
+        td = gen_normal().embed(3,1)
+        matrix = recurrence_matrix(td.embedded_data,eps,backend='numpy',block_size=block_size)
+        data = td.embedded_data
+        distance = np.sqrt(((data[:,None,:]-data[None,:,:])**2).sum(axis=-1))
+
+        assert matrix.dtype == np.uint8
+        assert np.array_equal(matrix,matrix.T)
+        assert np.all(np.diag(matrix) == 1)
+        # Ignore pairs that sit on the radius within float32 precision
+        ambiguous = np.isclose(distance,eps,rtol=1e-5)
+        assert np.array_equal(matrix[~ambiguous],(distance < eps)[~ambiguous])
+
+    @pytest.mark.skipif(not opencl_available(),reason='No OpenCL device available for PyRQA')
+    @pytest.mark.parametrize('eps',[.1,1,2.5])
+    def test_recurrence_matrix_t1(self,eps):
+        '''Test that the numpy and pyrqa backends return identical matrices'''
+
+        td = gen_normal(nt=300).embed(4,2)
+        matrix_numpy = recurrence_matrix(td.embedded_data,eps,backend='numpy',block_size=64)
+        matrix_pyrqa = recurrence_matrix(td.embedded_data,eps,backend='pyrqa')
+
+        assert np.array_equal(matrix_numpy,matrix_pyrqa)
+
+    def test_recurrence_matrix_t2(self):
+        '''Test that an unknown backend raises an error'''
+
+        td = gen_normal().embed(3,1)
+        with pytest.raises(ValueError):
+            recurrence_matrix(td.embedded_data,1,backend='cuda')
+
+class TestUtilsDistanceSparseRecurrenceMatrix:
+    '''Tests for sparse_recurrence_matrix function'''
+
+    @pytest.mark.parametrize('eps',[0,.1,1,2.5])
+    def test_sparse_recurrence_matrix_t0(self,eps):
+        '''Test that the sparse matrix has the same recurrent points as the dense numpy backend'''
+
+        td = gen_normal(nt=300).embed(4,2)
+        matrix_sparse = sparse_recurrence_matrix(td.embedded_data,eps)
+        matrix_dense = recurrence_matrix(td.embedded_data,eps,backend='numpy')
+
+        assert matrix_sparse.format == 'csr'
+        assert np.array_equal(matrix_sparse.toarray(),matrix_dense)
+
+class TestUtilsDistanceEpsilonFromDensity:
+    '''Tests for epsilon_from_density function'''
+
+    @pytest.mark.parametrize('target_density',[0,.05,.3,1])
+    def test_epsilon_from_density_t0(self,target_density):
+        '''Test that the exact radius is the smallest one reaching the target density'''
+
+        td = gen_normal(nt=300).embed(4,2)
+        eps, error = epsilon_from_density(td.embedded_data,target_density,block_size=64)
+        smaller = float(np.nextafter(np.float32(eps),np.float32(0)))
+
+        assert error == 0
+        assert recurrence_matrix(td.embedded_data,eps,backend='numpy').mean() >= target_density
+        assert recurrence_matrix(td.embedded_data,smaller,backend='numpy').mean() < max(target_density,1e-12)
+
+    def test_epsilon_from_density_t1(self):
+        '''Test that the sampled radius is within its error bound'''
+
+        td = gen_normal(nt=300).embed(4,2)
+        eps, error = epsilon_from_density(td.embedded_data,.1,sample_size=20000,seed=42)
+
+        assert 0 < error < .05
+        assert np.abs(recurrence_matrix(td.embedded_data,eps,backend='numpy').mean() - .1) <= error
+
+class TestUtilsDistanceRecurrenceFamily:
+    '''Tests for recurrence_family function'''
+
+    @pytest.mark.parametrize('sparse',[True,False])
+    def test_recurrence_family_t0(self,sparse):
+        '''Test that every member matches a recurrence matrix computed on its own'''
+
+        td = gen_normal(nt=300).embed(4,2)
+        epsilons = [1,0,2.5,.1]
+        matrices = list(recurrence_family(td.embedded_data,epsilons,sparse=sparse,block_size=64))
+        densities = list(recurrence_family(td.embedded_data,epsilons,output='density',sparse=sparse))
+
+        for eps,matrix,density in zip(epsilons,matrices,densities):
+            expected = recurrence_matrix(td.embedded_data,eps,backend='numpy')
+            if sparse:
+                matrix = matrix.toarray()
+            assert np.array_equal(matrix,expected)
+            assert density == np.count_nonzero(expected)/expected.size
+
+class TestUtilsDistanceRecurrenceDensity:
+    '''Tests for recurrence_density function'''
+
+    @pytest.mark.parametrize('eps,block_size',[(0,64),(.5,7),(2.5,512)])
+    def test_recurrence_density_t0(self,eps,block_size):
+        td = gen_normal(nt=300).embed(4,2)
+        matrix = recurrence_matrix(td.embedded_data,eps,backend='numpy')
+
+        assert recurrence_density(td.embedded_data,eps,block_size) == np.count_nonzero(matrix)/matrix.size
@@ -0,0 +1,52 @@
+''' Tests for ammonyte.utils.embedding
+Naming rules:
+1. class: Test{filename}{Class}{method} with appropriate camel case
+2. function: test_{method}_t{test_id}
+
+Notes on how to test:
+0. Make sure [pytest](https://docs.pytest.org) has been installed: `pip install pytest`
+1. execute `pytest {directory_path}` in terminal to perform all tests in all testing files inside the specified directory
+    (certain tests will only work when run from the tests directory, so make sure to run from there!)
+2. execute `pytest {file_path}` in terminal to perform all tests in the specified file
+3. execute `pytest {file_path}::{TestClass}::{test_method}` in terminal to perform a specific test class/method inside the specified file
+4. after `pip install pytest-xdist`, one may execute "pytest -n 4" to test in parallel with number of workers specified by `-n`
+5. for more details, see https://docs.pytest.org/en/stable/usage.html
+'''
+
+
+import pytest
+import numpy as np
+
+from ..utils.embedding import time_delay_embed
+
+class TestUtilsEmbeddingTimeDelayEmbed:
+    '''Tests for time_delay_embed function'''
+
+    @pytest.mark.parametrize('m,tau',[(1,1),(3,1),(10,5)])
+    def test_time_delay_embed_t0(self,m,tau):
+        '''Test that the view holds the expected delayed values without copying'''
+
+        values = np.random.default_rng(42).normal(size=100)
+        manifold = time_delay_embed(values,m,tau)
+
+        assert manifold.shape == (len(values)-m*tau,m)
+        assert np.shares_memory(manifold,values)
+        assert not manifold.flags.writeable
+        for idx in (0,len(manifold)-1):
+            assert np.array_equal(manifold[idx],values[idx:idx+m*tau:tau])
+
+    def test_time_delay_embed_t1(self):
+        '''Test the copy switch'''
+
+        values = np.random.default_rng(42).normal(size=100)
+        manifold = time_delay_embed(values,3,2,copy=True)
+
+        assert manifold.flags.writeable and manifold.flags.c_contiguous
+        assert not np.shares_memory(manifold,values)
+        assert np.array_equal(manifold,time_delay_embed(values,3,2))
+
+    def test_time_delay_embed_t2(self):
+        '''Test that series which are too short raise an error'''
+
+        with pytest.raises(ValueError):
+            time_delay_embed(np.arange(10),5,2)
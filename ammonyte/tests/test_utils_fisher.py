@@ -0,0 +1,89 @@
+''' Tests for ammonyte.utils.fisher
+Naming rules:
+1. class: Test{filename}{Class}{method} with appropriate camel case
+2. function: test_{method}_t{test_id}
+
+Notes on how to test:
+0. Make sure [pytest](https://docs.pytest.org) has been installed: `pip install pytest`
+1. execute `pytest {directory_path}` in terminal to perform all tests in all testing files inside the specified directory
+    (certain tests will only work when run from the tests directory, so make sure to run from there!)
+2. execute `pytest {file_path}` in terminal to perform all tests in the specified file
+3. execute `pytest {file_path}::{TestClass}::{test_method}` in terminal to perform a specific test class/method inside the specified file
+4. after `pip install pytest-xdist`, one may execute "pytest -n 4" to test in parallel with number of workers specified by `-n`
+5. for more details, see https://docs.pytest.org/en/stable/usage.html
+'''
+
+
+import pytest
+import numpy as np
+
+from ..utils.fisher import fisher_information, match_band, SOST
+
+def gen_walk(nt=200, num_vars=4):
+    ''' Generate a multivariate random walk
+    '''
+    t = np.arange(nt)
+    np.random.seed(42)
+    v = np.cumsum(np.random.normal(size=(nt,num_vars)),axis=0)
+    return t, v
+
+class TestUtilsFisherFisherInformation:
+    '''Tests for fisher_information function'''
+
+    @pytest.mark.parametrize('w_size,w_incre',[(50,5),(20,3)])
+    def test_fisher_information_t0(self,w_size,w_incre):
+        '''Test that row and array inputs give the same result'''
+
+        t, v = gen_walk()
+        eig_data = [[t[idx],*row] for idx,row in enumerate(v)]
+
+        time_rows, FI_rows = fisher_information(eig_data,w_size,w_incre)
+        time_array, FI_array = fisher_information(v,w_size,w_incre,time=t)
+
+        assert np.array_equal(time_rows,time_array)
+        assert np.array_equal(FI_rows,FI_array)
+        assert len(FI_array) == (len(t)-w_size)//w_incre + 1
+        assert time_array[0] == t[w_size-1]
+
+    def test_fisher_information_t1(self):
+        '''Test that identical points form a single cluster'''
+
+        t = np.arange(30)
+        v = np.ones((30,2))
+
+        _, FI = fisher_information(v,10,5,time=t)
+
+        assert np.all(FI == 8)
+
+class TestUtilsFisherMatchBand:
+    '''Tests for match_band function'''
+
+    @pytest.mark.parametrize('width',[1,10,250])
+    def test_match_band_t0(self,width):
+        '''Test that the band matches a brute force pairwise count'''
+
+        _, v = gen_walk()
+        sost = np.full(v.shape[1],2.)
+
+        band = match_band(v,sost,width)
+        matches = np.sum(np.abs(v[:,None,:]-v[None,:,:]) <= sost,axis=-1)
+
+        for lag in range(min(width,len(v))):
+            assert np.array_equal(band[lag,:len(v)-lag],np.diagonal(matches,lag))
+
+class TestUtilsFisherSOST:
+    '''Tests for SOST function'''
+
+    @pytest.mark.parametrize('w_size,chunk_size',[(20,4096),(50,7),(300,10)])
+    def test_SOST_t0(self,w_size,chunk_size):
+        '''Test against a direct loop over windows, skipping windows that contain zeros'''
+
+        _, v = gen_walk()
+        v[[3,60,61],[0,1,1]] = 0
+
+        sost = SOST(v,w_size,chunk_size=chunk_size)
+
+        for j in range(v.shape[1]):
+            stds = [np.std(v[i:i+w_size,j],ddof=1) for i in range(len(v)-w_size+1) if np.all(v[i:i+w_size,j] != 0)]
+            expected = 2*min(stds) if stds else 0
+            assert sost[j] == expected
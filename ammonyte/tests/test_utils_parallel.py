@@ -0,0 +1,34 @@
+''' Tests for ammonyte.utils.parallel
+Naming rules:
+1. class: Test{filename}{Class}{method} with appropriate camel case
+2. function: test_{method}_t{test_id}
+
+Notes on how to test:
+0. Make sure [pytest](https://docs.pytest.org) has been installed: `pip install pytest`
+1. execute `pytest {directory_path}` in terminal to perform all tests in all testing files inside the specified directory
+    (certain tests will only work when run from the tests directory, so make sure to run from there!)
+2. execute `pytest {file_path}` in terminal to perform all tests in the specified file
+3. execute `pytest {file_path}::{TestClass}::{test_method}` in terminal to perform a specific test class/method inside the specified file
+4. after `pip install pytest-xdist`, one may execute "pytest -n 4" to test in parallel with number of workers specified by `-n`
+5. for more details, see https://docs.pytest.org/en/stable/usage.html
+'''
+
+
+import numpy as np
+
+from ..utils.parallel import shared_pool, shared_call
+
+class TestUtilsParallelSharedPool:
+    '''Tests for shared_pool function'''
+
+    def test_shared_pool_t0(self):
+        '''Test that workers see the shared arrays and tasks only carry their arguments'''
+
+        x = np.arange(100,dtype=float).reshape(20,5)
+        y = np.ones(5)
+
+        with shared_pool(2,x=x,y=y) as pool:
+            res = pool.starmap(shared_call,[(np.dot,('x','y'))] + [(np.take,('x',),i) for i in range(3)])
+
+        assert np.array_equal(res[0],x @ y)
+        assert res[1:] == [0.,1.,2.]
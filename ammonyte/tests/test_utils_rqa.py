@@ -0,0 +1,177 @@
+''' Tests for ammonyte.utils.rqa
+Naming rules:
+1. class: Test{filename}{Class}{method} with appropriate camel case
+2. function: test_{method}_t{test_id}
+
+Notes on how to test:
+0. Make sure [pytest](https://docs.pytest.org) has been installed: `pip install pytest`
+1. execute `pytest {directory_path}` in terminal to perform all tests in all testing files inside the specified directory
+    (certain tests will only work when run from the tests directory, so make sure to run from there!)
+2. execute `pytest {file_path}` in terminal to perform all tests in the specified file
+3. execute `pytest {file_path}::{TestClass}::{test_method}` in terminal to perform a specific test class/method inside the specified file
+4. after `pip install pytest-xdist`, one may execute "pytest -n 4" to test in parallel with number of workers specified by `-n`
+5. for more details, see https://docs.pytest.org/en/stable/usage.html
+'''
+
+
+import pytest
+import numpy as np
+
+from pyrqa.time_series import TimeSeries
+from pyrqa.settings import Settings
+from pyrqa.analysis_type import Classic
+from pyrqa.neighbourhood import FixedRadius
+from pyrqa.metric import EuclideanMetric
+from pyrqa.computation import RQAComputation
+
+from ..utils.rqa import line_length_histogram, matrix_line_histograms, matrix_diagonal_rates, windowed_line_histograms, windowed_rqa, determinism, laminarity, trend
+from ..utils.distance import opencl_available, recurrence_matrix
+from ..utils.embedding import time_delay_embed
+from scipy import sparse as sps
+
+def gen_walk(nt=200):
+    ''' Generate a random walk
+    '''
+    np.random.seed(42)
+    v = np.cumsum(np.random.normal(size=nt))/3
+    return v
+
+class TestUtilsRQALineLengthHistogram:
+    '''Tests for line_length_histogram function'''
+
+    def test_line_length_histogram_t0(self):
+        lines = np.array([[1,1,0,1,1,1],
+                          [0,0,0,0,0,0],
+                          [1,1,1,1,1,1],
+                          [1,0,1,0,1,0]],dtype=bool)
+
+        histogram = line_length_histogram(lines)
+
+        assert np.array_equal(histogram,[3,1,1,0,0,1])
+
+class TestUtilsRQAMatrixLineHistograms:
+    '''Tests for matrix_line_histograms function'''
+
+    @pytest.mark.parametrize('theiler,chunk_size',[(1,None),(3,7)])
+    def test_matrix_line_histograms_t0(self,theiler,chunk_size):
+        '''Test that dense and sparse matrices match the windowed histograms of the same series'''
+
+        v = gen_walk()
+        matrix = recurrence_matrix(time_delay_embed(v,3,2,trim=False),1.,backend='numpy')
+        (diagonal,vertical), = windowed_line_histograms(v,[(0,len(v))],3,2,1.,theiler)
+
+        for rm in (matrix,sps.csr_matrix(matrix)):
+            matrix_diagonal,matrix_vertical = matrix_line_histograms(rm,theiler,chunk_size)
+            assert np.array_equal(matrix_diagonal,diagonal)
+            assert np.array_equal(matrix_vertical,vertical)
+
+    def test_matrix_line_histograms_t1(self):
+        '''Test that asymmetric matrices count lines in both triangles'''
+
+        np.random.seed(42)
+        matrix = (np.random.uniform(size=(40,40)) < .6).astype(np.uint8)
+
+        dense = matrix_line_histograms(matrix,chunk_size=5)
+        sparse = matrix_line_histograms(sps.csr_matrix(matrix))
+        expected = np.zeros(40,dtype=np.uint64)
+        for k in range(1,40):
+            for lines in (np.diagonal(matrix,k),np.diagonal(matrix,-k)):
+                histogram = line_length_histogram(lines[None,:])
+                expected[:len(histogram)] += histogram
+
+        for diagonal,vertical in (dense,sparse):
+            assert np.array_equal(diagonal,expected)
+            assert np.array_equal(vertical,line_length_histogram(matrix.T))
+
+class TestUtilsRQAMatrixDiagonalRates:
+    '''Tests for matrix_diagonal_rates function'''
+
+    def test_matrix_diagonal_rates_t0(self):
+        np.random.seed(42)
+        matrix = (np.random.uniform(size=(40,40)) < .6).astype(np.uint8)
+        rates = [np.mean(np.diagonal(matrix,k)) for k in range(40)]
+
+        assert np.allclose(matrix_diagonal_rates(matrix),rates)
+        assert np.allclose(matrix_diagonal_rates(sps.csr_matrix(matrix)),rates)
+
+class TestUtilsRQAWindowedLineHistograms:
+    '''Tests for windowed_line_histograms function'''
+
+    @pytest.mark.skipif(not opencl_available(),reason='No OpenCL device available for PyRQA')
+    @pytest.mark.parametrize('m,tau,eps,theiler',[(3,2,1.,1),(2,1,.5,3)])
+    def test_windowed_line_histograms_t0(self,m,tau,eps,theiler):
+        '''Test that histograms and measures match PyRQA for each window'''
+
+        v = gen_walk()
+        windows = [(0,60),(15,75),(100,200),(150,200)]
+
+        for (start,stop),(diagonal,vertical) in zip(windows,windowed_line_histograms(v,windows,m,tau,eps,theiler)):
+            ts = TimeSeries(v[start:stop],embedding_dimension=m,time_delay=tau)
+            settings = Settings(ts,
+                                analysis_type=Classic,
+                                neighbourhood=FixedRadius(eps),
+                                similarity_measure=EuclideanMetric,
+                                theiler_corrector=theiler)
+            result = RQAComputation.create(settings,verbose=False).run()
+
+            assert np.array_equal(diagonal,result.diagonal_frequency_distribution)
+            assert np.array_equal(vertical,result.vertical_frequency_distribution)
+            assert determinism(diagonal) == result.determinism
+            assert laminarity(vertical) == result.laminarity
+
+    def test_windowed_line_histograms_t1(self):
+        '''Test that windows too short to embed give empty histograms'''
+
+        v = gen_walk()
+        (diagonal,vertical), = windowed_line_histograms(v,[(0,5)],3,3,1.)
+
+        assert diagonal.size == 0 and vertical.size == 0
+        assert np.isnan(determinism(diagonal))
+
+class TestUtilsRQAWindowedRQA:
+    '''Tests for windowed_rqa function'''
+
+    @pytest.mark.skipif(not opencl_available(),reason='No OpenCL device available for PyRQA')
+    @pytest.mark.parametrize('theiler,l_min,v_min',[(1,2,2),(3,3,4)])
+    def test_windowed_rqa_t0(self,theiler,l_min,v_min):
+        '''Test that every measure PyRQA provides matches it'''
+
+        v = gen_walk()
+        windows = [(0,60),(100,200)]
+        measures = ['RR','DET','L','Lmax','ENTR','LAM','TT','Vmax']
+
+        for (start,stop),res in zip(windows,windowed_rqa(v,windows,3,2,1.,measures,theiler,l_min,v_min)):
+            ts = TimeSeries(v[start:stop],embedding_dimension=3,time_delay=2)
+            settings = Settings(ts,
+                                analysis_type=Classic,
+                                neighbourhood=FixedRadius(1.),
+                                similarity_measure=EuclideanMetric,
+                                theiler_corrector=theiler)
+            result = RQAComputation.create(settings,verbose=False).run()
+            result.min_diagonal_line_length = l_min
+            result.min_vertical_line_length = v_min
+
+            assert res['RR'] == result.recurrence_rate
+            assert res['DET'] == result.determinism
+            assert res['L'] == result.average_diagonal_line
+            assert res['Lmax'] == result.longest_diagonal_line
+            assert res['ENTR'] == result.entropy_diagonal_lines
+            assert res['LAM'] == result.laminarity
+            assert res['TT'] == result.trapping_time
+            assert res['Vmax'] == result.longest_vertical_line
+
+    def test_windowed_rqa_t1(self):
+        '''Test that unknown measures raise an error'''
+
+        with pytest.raises(ValueError):
+            next(windowed_rqa(gen_walk(),[(0,60)],3,2,1.,['DETERMINISM']))
+
+class TestUtilsRQATrend:
+    '''Tests for trend function'''
+
+    def test_trend_t0(self):
+        '''Test that a linear decrease in recurrence rate gives its slope'''
+
+        rates = 1 - .01*np.arange(50)
+
+        assert np.isclose(trend(rates),-.01)
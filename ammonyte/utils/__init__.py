@@ -6,4 +6,8 @@ from .range_finder import *
 from .plotting import *
 from .parameters import *
 from .fisher import *
-from .rm import *
\ No newline at end of file
+from .rm import *
+from .distance import *
+from .embedding import *
+from .rqa import *
+from .parallel import *
\ No newline at end of file
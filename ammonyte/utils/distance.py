@@ -0,0 +1,512 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+import functools
+import math
+
+import numpy as np
+
+from scipy import sparse as sps
+from scipy.spatial import cKDTree
+from pyrqa.time_series import EmbeddedSeries
+from pyrqa.settings import Settings
+from pyrqa.analysis_type import Classic
+from pyrqa.neighbourhood import FixedRadius
+from pyrqa.metric import EuclideanMetric
+from pyrqa.computation import RPComputation
+
+__all__ = [
+    'recurrence_matrix',
+    'sparse_recurrence_matrix',
+    'recurrence_band',
+    'recurrence_family',
+    'recurrence_density',
+    'epsilon_from_density',
+    'opencl_available',
+]
+
+BACKENDS = ('numpy','pyrqa')
+
+@functools.lru_cache(maxsize=None)
+def opencl_available():
+    '''Check whether an OpenCL device is available for PyRQA to run on.
+
+    The result is cached, so the platform query only happens once per session.
+
+    Returns
+    -------
+
+    available : bool
+        True if at least one OpenCL platform exposes a device
+    '''
+
+    try:
+        import pyopencl as cl
+        return any(len(platform.get_devices()) > 0 for platform in cl.get_platforms())
+    except Exception:
+        return False
+
+def resolve_backend(backend):
+    '''Function to pick the recurrence matrix backend.
+
+    If backend is None, PyRQA is used when an OpenCL device is present and numpy otherwise.'''
+
+    if backend is None:
+        backend = 'pyrqa' if opencl_available() else 'numpy'
+
+    if backend not in BACKENDS:
+        raise ValueError(f'Backend "{backend}" is not recognized. Please use one of {BACKENDS}')
+
+    return backend
+
+def as_float32(embedded_data):
+    '''Cast embedded data to a 2D float32 array, the precision PyRQA computes distances in'''
+
+    data = np.asarray(embedded_data,dtype=np.float32)
+    if data.ndim == 1:
+        data = data.reshape(-1,1)
+
+    return data
+
+def squared_distance(x,y):
+    '''Squared euclidean distance between paired rows of x and y, accumulated in float32 one dimension
+    at a time to follow PyRQA's kernels'''
+
+    distance = np.zeros(np.broadcast_shapes(x.shape,y.shape)[:-1],dtype=np.float32)
+    for dim in range(x.shape[-1]):
+        diff = x[...,dim] - y[...,dim]
+        distance += diff*diff
+
+    return distance
+
+def recurrence_matrix(embedded_data,epsilon,backend=None,block_size=512,sparse=False):
+    '''Function to calculate a fixed radius recurrence matrix from time delay embedded data
+
+    The numpy backend computes the thresholded euclidean distance matrix in square tiles of
+    block_size x block_size points, only computing the upper triangle and mirroring it. It follows
+    PyRQA's arithmetic (float32 data, squared distances accumulated one dimension at a time,
+    compared with `sum < epsilon**2`) so both backends return identical matrices.
+
+    Parameters
+    ----------
+
+    embedded_data : array
+        Time delay embedded data of shape (n_points, m)
+
+    epsilon : float
+        Fixed radius used to calculate whether two points are recurrent
+
+    backend : str; {'numpy','pyrqa'}
+        Engine used to compute the matrix. If None, PyRQA is used when an OpenCL device is available
+        and numpy otherwise.
+
+    block_size : int
+        Edge length of the tiles used by the numpy backend. The default keeps each tile around 1 MB.
+
+    sparse : bool; {True,False}
+        Whether to return a scipy.sparse CSR matrix built from a neighbour search instead of a dense array.
+        Only available with the numpy backend. See ammonyte.utils.distance.sparse_recurrence_matrix
+
+    Returns
+    -------
+
+    matrix : numpy.ndarray, scipy.sparse.csr_matrix
+        Recurrence matrix of shape (n_points, n_points) with dtype uint8
+
+    See also
+    --------
+
+    ammonyte.utils.distance.opencl_available
+
+    ammonyte.utils.distance.sparse_recurrence_matrix
+    '''
+
+    if sparse:
+        if backend == 'pyrqa':
+            raise ValueError('Sparse recurrence matrices are built with a neighbour search and are not available for the pyrqa backend')
+        return sparse_recurrence_matrix(embedded_data,epsilon)
+
+    backend = resolve_backend(backend)
+
+    if backend == 'pyrqa':
+
+        ts = EmbeddedSeries(embedded_data)
+
+        settings = Settings(ts,
+                            analysis_type=Classic,
+                            neighbourhood=FixedRadius(epsilon),
+                            similarity_measure=EuclideanMetric)
+
+        computation = RPComputation.create(settings,
+                                           verbose=False)
+
+        result = computation.run()
+
+        return result.recurrence_matrix
+
+    data = as_float32(embedded_data)
+    n = len(data)
+    threshold = np.float32(epsilon)*np.float32(epsilon)
+    matrix = np.empty((n,n),dtype=np.uint8)
+
+    for row_start in range(0,n,block_size):
+        rows = data[row_start:row_start+block_size]
+
+        for col_start in range(row_start,n,block_size):
+            cols = data[col_start:col_start+block_size]
+
+            tile = squared_distance(rows[:,None,:],cols[None,:,:]) < threshold
+            matrix[row_start:row_start+len(rows),col_start:col_start+len(cols)] = tile
+            matrix[col_start:col_start+len(cols),row_start:row_start+len(rows)] = tile.T
+
+    return matrix
+
+def recurrence_density(embedded_data,epsilon,block_size=512):
+    '''Function to calculate the density of a fixed radius recurrence matrix without storing the matrix
+
+    Recurrent points are counted tile by tile over the upper triangle, with the same arithmetic as
+    ammonyte.utils.distance.recurrence_matrix, so memory use stays at one tile.
+
+    Parameters
+    ----------
+
+    embedded_data : array
+        Time delay embedded data of shape (n_points, m)
+
+    epsilon : float
+        Fixed radius used to calculate whether two points are recurrent
+
+    block_size : int
+        Edge length of the tiles
+
+    Returns
+    -------
+
+    density : float
+        Fraction of recurrent points in the recurrence matrix
+    '''
+
+    data = as_float32(embedded_data)
+    n = len(data)
+    threshold = np.float32(epsilon)*np.float32(epsilon)
+    count = 0
+
+    for row_start in range(0,n,block_size):
+        rows = data[row_start:row_start+block_size]
+
+        for col_start in range(row_start,n,block_size):
+            cols = data[col_start:col_start+block_size]
+
+            recurrent = np.count_nonzero(squared_distance(rows[:,None,:],cols[None,:,:]) < threshold)
+            #Off-diagonal tiles stand for their mirror image too
+            count += recurrent if col_start == row_start else 2*recurrent
+
+    return count/(n*n)
+
+def sparse_recurrence_matrix(embedded_data,epsilon):
+    '''Function to calculate a fixed radius recurrence matrix in scipy.sparse CSR format
+
+    Candidate pairs are found with a KD-tree ball query, so the dense n x n matrix is never materialised.
+    Candidates are then checked with the same float32 arithmetic as the dense backends, so the result
+    has exactly the same recurrent points as ammonyte.utils.distance.recurrence_matrix.
+
+    Parameters
+    ----------
+
+    embedded_data : array
+        Time delay embedded data of shape (n_points, m)
+
+    epsilon : float
+        Fixed radius used to calculate whether two points are recurrent
+
+    Returns
+    -------
+
+    matrix : scipy.sparse.csr_matrix
+        Recurrence matrix of shape (n_points, n_points) with dtype uint8
+
+    See also
+    --------
+
+    scipy.spatial.cKDTree.query_pairs
+    '''
+
+    data = as_float32(embedded_data)
+    pairs, _ = neighbour_pairs(data,epsilon,sort=False)
+
+    return pairs_matrix(pairs,len(data),np.float32(epsilon)*np.float32(epsilon) > 0)
+
+def neighbour_pairs(data,epsilon,sort=True):
+    '''Pairs of distinct float32 points closer than epsilon, with their squared distances, optionally sorted by distance
+
+    Candidate pairs are found with a KD-tree ball query and checked with the same float32 arithmetic as
+    ammonyte.utils.distance.recurrence_matrix'''
+
+    threshold = np.float32(epsilon)*np.float32(epsilon)
+
+    #Pad the search radius slightly so float32 rounding can't drop pairs that sit on the radius
+    tree = cKDTree(data.astype(np.float64))
+    pairs = tree.query_pairs(float(epsilon)*(1+1e-4),output_type='ndarray').reshape(-1,2)
+    distances = squared_distance(data[pairs[:,0]],data[pairs[:,1]])
+
+    recurrent = distances < threshold
+    pairs, distances = pairs[recurrent], distances[recurrent]
+
+    if sort:
+        order = np.argsort(distances,kind='stable')
+        pairs, distances = pairs[order], distances[order]
+
+    return pairs, distances
+
+def pairs_matrix(pairs,n,diagonal=True):
+    '''Symmetric CSR recurrence matrix with the given recurrent pairs and, if diagonal is True, the main diagonal'''
+
+    diagonal = np.arange(n) if diagonal else np.array([],dtype=int)
+    rows = np.concatenate((pairs[:,0],pairs[:,1],diagonal))
+    cols = np.concatenate((pairs[:,1],pairs[:,0],diagonal))
+
+    return sps.csr_matrix((np.ones(len(rows),dtype=np.uint8),(rows,cols)),shape=(n,n))
+
+def recurrence_band(embedded_data,epsilon,width):
+    '''Function to calculate the recurrence band of a fixed radius recurrence matrix
+
+    The band holds the first width diagonals of the (symmetric) recurrence matrix, so any
+    recurrence matrix of a window of fewer than width consecutive points is a sub-block of it.
+    Distances follow the same float32 arithmetic as ammonyte.utils.distance.recurrence_matrix.
+
+    Parameters
+    ----------
+
+    embedded_data : array
+        Time delay embedded data of shape (n_points, m)
+
+    epsilon : float
+        Fixed radius used to calculate whether two points are recurrent
+
+    width : int
+        Number of diagonals to compute, including the main diagonal
+
+    Returns
+    -------
+
+    band : numpy.ndarray
+        Boolean array of shape (width, n_points) where band[lag, i] is True if points i and i+lag
+        are recurrent. Entries past the end of the series are False.
+    '''
+
+    data = as_float32(embedded_data)
+    n = len(data)
+    threshold = np.float32(epsilon)*np.float32(epsilon)
+
+    band = np.zeros((width,n),dtype=bool)
+    band[0] = threshold > 0
+
+    for lag in range(1,min(width,n)):
+        band[lag,:n-lag] = squared_distance(data[:-lag],data[lag:]) < threshold
+
+    return band
+
+def squared_distance_matrix(embedded_data,block_size=512):
+    '''Full float32 squared distance matrix, computed in tiles with the same arithmetic as
+    ammonyte.utils.distance.recurrence_matrix'''
+
+    data = as_float32(embedded_data)
+    n = len(data)
+    distances = np.empty((n,n),dtype=np.float32)
+
+    for row_start in range(0,n,block_size):
+        rows = data[row_start:row_start+block_size]
+
+        for col_start in range(row_start,n,block_size):
+            cols = data[col_start:col_start+block_size]
+
+            tile = squared_distance(rows[:,None,:],cols[None,:,:])
+            distances[row_start:row_start+len(rows),col_start:col_start+len(cols)] = tile
+            distances[col_start:col_start+len(cols),row_start:row_start+len(rows)] = tile.T
+
+    return distances
+
+def recurrence_family(embedded_data,epsilons,output='matrix',sparse=False,block_size=512):
+    '''Function to calculate recurrence matrices or densities for several radii from a single distance computation
+
+    Distances are computed once, on the first iteration, and every radius is then a threshold of them. Dense
+    matrices are thresholds of the full squared distance matrix. Sparse matrices and densities are prefixes of the
+    pairwise distances sorted once, so each radius only costs a binary search. Results are identical to calling
+    ammonyte.utils.distance.recurrence_matrix for every radius.
+
+    Parameters
+    ----------
+
+    embedded_data : array
+        Time delay embedded data of shape (n_points, m)
+
+    epsilons : list
+        Fixed radii used to calculate whether two points are recurrent
+
+    output : str; {'matrix','density'}
+        Whether to yield recurrence matrices or their densities
+
+    sparse : bool; {True,False}
+        Whether to base the family on a neighbour search within the largest radius instead of the full distance matrix.
+        Matrices are then yielded in scipy.sparse CSR format. Worthwhile when the largest radius gives a sparse matrix
+
+    block_size : int
+        Edge length of the tiles used to compute the full distance matrix
+
+    Yields
+    ------
+
+    matrix : numpy.ndarray, scipy.sparse.csr_matrix, float
+        Recurrence matrix (or its density) for each radius, in the order of epsilons
+
+    See also
+    --------
+
+    ammonyte.utils.distance.recurrence_matrix
+    '''
+
+    if output not in ('matrix','density'):
+        raise ValueError(f'Output "{output}" is not recognized. Please use one of matrix or density')
+
+    epsilons = list(epsilons)
+    if len(epsilons) == 0:
+        return
+
+    data = as_float32(embedded_data)
+    n = len(data)
+    thresholds = [np.float32(epsilon)*np.float32(epsilon) for epsilon in epsilons]
+
+    if sparse:
+        pairs, distances = neighbour_pairs(data,max(epsilons))
+    elif output == 'density':
+        distances = np.sort(pairwise_squared_distances(data,block_size))
+    else:
+        distances = squared_distance_matrix(data,block_size)
+
+    for threshold in thresholds:
+        if output == 'density':
+            #Each recurrent pair appears twice in the matrix and the main diagonal is recurrent for any positive radius
+            count = np.searchsorted(distances,threshold,side='left')
+            yield (2*count + (n if threshold > 0 else 0))/(n*n)
+        elif sparse:
+            yield pairs_matrix(pairs[:np.searchsorted(distances,threshold,side='left')],n,threshold > 0)
+        else:
+            yield (distances < threshold).astype(np.uint8)
+
+def pairwise_squared_distances(embedded_data,block_size=512):
+    '''Condensed float32 squared distances between every pair of distinct points, computed in tiles
+    with the same arithmetic as ammonyte.utils.distance.recurrence_matrix'''
+
+    data = as_float32(embedded_data)
+    n = len(data)
+    distances = []
+
+    for row_start in range(0,n,block_size):
+        rows = data[row_start:row_start+block_size]
+        tile = squared_distance(rows[:,None,:],data[None,row_start:,:])
+        distances.append(tile[np.triu_indices(len(rows),k=1,m=n-row_start)])
+
+    return np.concatenate(distances) if distances else np.array([],dtype=np.float32)
+
+def epsilon_above(squared_distance):
+    '''Smallest float32 radius e with e*e > squared_distance in float32 arithmetic, so that a recurrence
+    matrix built with e contains exactly the pairs closer than or as close as squared_distance'''
+
+    squared_distance = np.float32(max(squared_distance,0))
+
+    #Bisect over the bit patterns of positive float32 values, which are ordered like the values themselves
+    low = 0
+    high = int(np.float32(math.sqrt(squared_distance)*(1+1e-6)+1e-22).view(np.int32))
+
+    while high - low > 1:
+        mid = (low+high)//2
+        e = np.int32(mid).view(np.float32)
+        if e*e > squared_distance:
+            high = mid
+        else:
+            low = mid
+
+    return float(np.int32(high).view(np.float32))
+
+def epsilon_from_density(embedded_data,target_density,sample_size=None,confidence=.95,seed=None,block_size=512):
+    '''Function to calculate the recurrence radius that gives a target recurrence matrix density
+
+    The density at radius epsilon is the fraction of pairwise distances below epsilon (counting the main
+    diagonal), so epsilon follows directly from a selection over the pairwise distances instead of a search.
+
+    By default every pairwise distance is computed once and the exact order statistic is selected. The
+    returned radius is the smallest one whose recurrence matrix density is at least target_density, so the
+    density is exact up to ties between distances. This needs n*(n-1)/2 float32 values of memory.
+
+    If sample_size is passed, the radius is instead estimated as a quantile of the distances of sample_size
+    random pairs of points. By the Dvoretzky-Kiefer-Wolfowitz inequality the density of the resulting matrix
+    is then within the returned error of target_density with probability confidence.
+
+    Parameters
+    ----------
+
+    embedded_data : array
+        Time delay embedded data of shape (n_points, m)
+
+    target_density : float
+        Desired recurrence matrix density, between 0 and 1
+
+    sample_size : int
+        Number of random pairs of points used to estimate the radius. If None, the exact radius is calculated
+
+    confidence : float
+        Probability with which the density of a sampled radius is within the returned error of target_density
+
+    seed : int
+        Seed for the random number generator used to sample pairs
+
+    block_size : int
+        Edge length of the tiles used to compute the exact pairwise distances
+
+    Returns
+    -------
+
+    epsilon : float
+        Recurrence radius
+
+    error : float
+        Bound on the absolute difference between the density at epsilon and target_density. 0 for the exact radius,
+        apart from ties
+
+    See also
+    --------
+
+    ammonyte.utils.distance.recurrence_matrix
+    '''
+
+    if not 0 <= target_density <= 1:
+        raise ValueError(f'Target density must be between 0 and 1, got {target_density}')
+
+    data = as_float32(embedded_data)
+    n = len(data)
+    num_pairs = n*(n-1)//2
+
+    if num_pairs == 0:
+        return epsilon_above(0), 0.
+
+    #Each off-diagonal pair appears twice in the matrix and the main diagonal is always recurrent
+    fraction = min(max((target_density*n*n - n)/(2*num_pairs),0),1)
+
+    if sample_size is None:
+        distances = pairwise_squared_distances(data,block_size)
+        error = 0.
+    else:
+        rng = np.random.default_rng(seed)
+        i = rng.integers(0,n,size=sample_size)
+        j = rng.integers(0,n-1,size=sample_size)
+        j += j >= i
+        distances = squared_distance(data[i],data[j])
+        error = math.sqrt(math.log(2/(1-confidence))/(2*sample_size))*2*num_pairs/(n*n)
+
+    #Number of pairs that have to be recurrent
+    k = math.ceil(fraction*len(distances)-1e-9)
+
+    if k == 0:
+        return epsilon_above(0), error
+
+    return epsilon_above(np.partition(distances,k-1)[k-1]), error
@@ -0,0 +1,63 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+import numpy as np
+
+from numpy.lib.stride_tricks import sliding_window_view
+
+__all__ = [
+    'time_delay_embed',
+]
+
+def time_delay_embed(values,m,tau,copy=False,trim=True):
+    '''Function to create a time delay embedding of a series of values
+
+    Row i of the embedding is values[i], values[i+tau], ..., values[i+(m-1)*tau]. By default the
+    embedding has len(values) - m*tau rows, matching the time axis used by ammonyte.TimeEmbeddedSeries.
+
+    By default the embedding is a read-only strided view of values, so no data is copied and
+    sweeping m and tau costs no memory until distances are computed.
+
+    Parameters
+    ----------
+
+    values : array
+        Values of the series to embed
+
+    m : int
+        Embedding dimension
+
+    tau : int
+        Embedding delay
+
+    copy : bool; {True,False}
+        Whether to return a writable, contiguous copy instead of a read-only view
+
+    trim : bool; {True,False}
+        Whether to drop the last tau delay vectors so the embedding lines up with ammonyte.TimeEmbeddedSeries.
+        If False every complete delay vector is kept (len(values) - (m-1)*tau rows), as in PyRQA
+
+    Returns
+    -------
+
+    manifold : numpy.ndarray
+        Time delay embedded data of shape (len(values) - m*tau, m), or (len(values) - (m-1)*tau, m) if trim is False
+
+    See also
+    --------
+
+    numpy.lib.stride_tricks.sliding_window_view
+    '''
+
+    values = np.asarray(values)
+    num_points = len(values) - m*tau if trim else len(values) - (m-1)*tau
+
+    if num_points <= 0:
+        raise ValueError(f'Series of length {len(values)} is too short to embed with m={m} and tau={tau}')
+
+    manifold = sliding_window_view(values,(m-1)*tau+1)[:num_points,::tau]
+
+    if copy:
+        manifold = np.ascontiguousarray(manifold)
+
+    return manifold
@@ -11,145 +11,231 @@ import math
 import numpy as np
 import pyleoclim as pyleo
 
+from numpy.lib.stride_tricks import sliding_window_view
+
 __all__ = [
     'fisher_information',
+    'SOST',
     'smooth_series'
 ]
 
-def fisher_information(eig_data,w_size,w_incre):
-    Data_num=[]
-    Time=[]
-    
-    for row in eig_data:
-        Time.append(row[0])
-        temp=[]
-        for i in range(1,len(row)):
-            if row[i]=='':
-                temp.append(0)
-            else:
-                temp.append(float(row[i]))
-        Data_num.append(temp)
-        
-    sost_data = SOST(eig_data,w_size)
-    sost = sost_data.values[0]
-    
+def fisher_information(eig_data,w_size,w_incre,time=None,sost=None):
+    '''Function to calculate Fisher information over sliding windows of a multivariate series
+
+    Pairwise within-SOST match counts are computed once for every pair of points closer than w_size
+    in time (see match_band), and each window's match table is gathered from that shared band, so the
+    comparisons scale with the length of the series rather than with the number of windows. Since
+    match counts are integers, the 100 size-of-state thresholds collapse onto at most one clustering
+    per distinct integer count, which is then reused for every threshold that maps onto it.
+
+    Parameters
+    ----------
+
+    eig_data : list, numpy.ndarray
+        If time is None, rows of [time, x_1, ..., x_k] (empty strings are treated as zeros).
+        Otherwise an array of shape (n_points, k) containing the variables only.
+
+    w_size : int
+        Window size for the fisher information
+
+    w_incre : int
+        Window increment for the fisher information
+
+    time : list, numpy.ndarray
+        Time axis associated with eig_data. Only needed if eig_data doesn't contain time in its first column
+
+    sost : numpy.ndarray
+        Precomputed size of states for each variable. If None, calculated with SOST(data,w_size)
+
+    Returns
+    -------
+
+    time_axis : numpy.ndarray
+        Time of the last point in each window
+
+    values : numpy.ndarray
+        Fisher information of each window
+
+    See also
+    --------
+
+    ammonyte.utils.fisher.SOST
+    '''
+
+    if time is None:
+        Time = [row[0] for row in eig_data]
+        data = np.array([[0 if value == '' else value for value in row[1:]] for row in eig_data],dtype=float)
+    else:
+        Time = time
+        data = np.asarray(eig_data,dtype=float)
+
+    if data.ndim == 1:
+        data = data.reshape(-1,1)
+
+    if sost is None:
+        sost = SOST(data,w_size)
+
+    num_vars = len(sost)
+    thresholds = [math.ceil(num_vars*float(tl)/100) for tl in range(1,101)]
+
+    band = match_band(data,sost,w_size)
+    index = np.arange(w_size)
+    lags = np.abs(index[:,None]-index[None,:])
+    offsets = np.minimum(index[:,None],index[None,:])
+
     FI_final=[]
     k_init=[]
-    for i in range(0,len(Data_num),w_incre):
-        
-        Data_win=Data_num[i:i+w_size]
-        win_number=i
-        
-        if len(Data_win)==w_size:
-            Bin=[]
-            for m in range(len( Data_win)):
-                Bin_temp=[]
-                
-                for n in range(len( Data_win)):
-                    if m==n:
-                        Bin_temp.append('I')
-                    else:
-                        Bin_temp_1=[]
-                    
-                        for k in range(len(Data_win[n])):
-                            if (abs(Data_win[m][k]-Data_win[n][k]))<=sost[k]:
-                                Bin_temp_1.append(1)
-                            else:
-                                Bin_temp_1.append(0)
-                                
-                        Bin_temp.append(sum(Bin_temp_1))
-                        
-                Bin.append(Bin_temp)
-            
-            FI=[]
-            for tl in range(1,101):
-                tl1=len(sost)*float(tl)/100
-                Bin_1=[]
-                Bin_2=[]
-                
-                for j in range(len(Bin)):
-                    if j not in Bin_2:
-                       
-                        Bin_1_temp=[j]
-                        for i in range(len(Bin[j])):
-                            if Bin[j][i]!='I' and Bin[j][i]>=tl1 and i not in Bin_2:
-                                Bin_1_temp.append(i)
-                                
-                        Bin_1.append(Bin_1_temp)
-                        Bin_2.extend(Bin_1_temp)
-
-                prob=[0]
-                for i in Bin_1:
-                    prob.append(float(len(i))/len(Bin_2))
-                    
-                prob.append(0)
-                
-                prob_q=[]
-                for i in prob:
-                    prob_q.append(math.sqrt(i))
-                    
-                FI_temp=0
-                for i in range(len(prob_q)-1):
-                    FI_temp+=(prob_q[i]-prob_q[i+1])**2
-                FI_temp=4*FI_temp    
-                
-                FI.append(FI_temp)
-                
-            for i in range(len(FI)):
-                if FI[i]!=8.0:
-                    k_init.append(FI.index(FI[i]))
-                    break
-                
-            FI_final.append(FI)
-            
+    time_axis = []
+
+    for start in range(0,len(data)-w_size+1,w_incre):
+
+        matches = band[lags,start+offsets]
+
+        FI_by_threshold = {}
+        for threshold in set(thresholds):
+            FI_by_threshold[threshold] = fisher_from_clusters(cluster_sizes(matches >= threshold),w_size)
+
+        FI = [FI_by_threshold[threshold] for threshold in thresholds]
+
+        for i in range(len(FI)):
+            if FI[i]!=8.0:
+                k_init.append(i)
+                break
+
+        FI_final.append(FI)
+        time_axis.append(Time[start+w_size-1])
+
     if len(k_init)==0:
         k_init.append(0)
-        
-    time_axis = []
-    
-    for i in range(0,len(FI_final)):
-        FI_final[i].append(float(sum(FI_final[i][min(k_init):len(FI_final[i])]))/len(FI_final[i][min(k_init):len(FI_final[i])]))
-        time_axis.append(Time[(i*w_incre+w_size)-1])
-        
-    FI_final = pd.DataFrame(FI_final)
-    values = FI_final.iloc[:,-1]
-    
+
+    k_min = min(k_init)
+    values = [float(sum(FI[k_min:]))/len(FI[k_min:]) for FI in FI_final]
+
     return np.array(time_axis), np.array(values)
-        
-def SOST(eig_data,s_for_sd):
-    Data_num=[]
-    
-    for row in eig_data:
-        temp=[]
-        for i in range(1,len(row)):
-            if row[i]=='':
-                temp.append(0)
-            else:
-                temp.append(float(row[i]))
-        Data_num.append(temp)
-        
-    df=pd.DataFrame(Data_num)
-    
-    sos=[]
-    for j in range(len(df.columns)):
-        sos_temp=[]
-        for i in df.index:
-            A=list(df[j][i:i+s_for_sd])
-            A_1=[float(i) for i in A if i!=0 ]
-        
-            if len(A_1)==s_for_sd:
-                sos_temp.append(np.std(A_1,ddof=1))
-                
-        if len(sos_temp)==0:
-            sos.append(0)
-        else:
-            
-            sos.append(min(sos_temp)*2)
-        
-    df_sos=pd.DataFrame(sos)
-    df_sos=df_sos.transpose()
-    
-    return df_sos
+
+def match_band(data,sost,width):
+    '''Count within-SOST matching variables for every pair of points less than width apart in time
+
+    Parameters
+    ----------
+
+    data : numpy.ndarray
+        Array of shape (n_points, k)
+
+    sost : numpy.ndarray
+        Size of states for each of the k variables
+
+    width : int
+        Number of lags to compute, typically the fisher information window size
+
+    Returns
+    -------
+
+    band : numpy.ndarray
+        Array of shape (width, n_points) where band[lag, i] is the number of variables for which
+        points i and i+lag are within one size of state of each other. Entries past the end of the
+        series are zero.
+    '''
+
+    num_points, num_vars = data.shape
+    band = np.zeros((width,num_points),dtype=np.min_scalar_type(num_vars))
+    band[0] = num_vars
+
+    for lag in range(1,min(width,num_points)):
+        band[lag,:num_points-lag] = np.sum(np.abs(data[lag:]-data[:-lag]) <= sost,axis=1)
+
+    return band
+
+def cluster_sizes(adjacency):
+    '''Greedily cluster points, in order, with every not yet clustered point they are adjacent to
+
+    Parameters
+    ----------
+
+    adjacency : numpy.ndarray
+        Boolean array of shape (n_points, n_points)
+
+    Returns
+    -------
+
+    sizes : list
+        Number of points in each cluster, in the order the clusters were formed
+    '''
+
+    visited = np.zeros(len(adjacency),dtype=bool)
+    sizes = []
+
+    for j in range(len(adjacency)):
+        if not visited[j]:
+            members = adjacency[j] & ~visited
+            members[j] = True
+            sizes.append(int(np.count_nonzero(members)))
+            visited |= members
+
+    return sizes
+
+def fisher_from_clusters(sizes,num_points):
+    '''Fisher information of the probability distribution given by a sequence of cluster sizes'''
+
+    prob = [0] + [float(size)/num_points for size in sizes] + [0]
+    prob_q = [math.sqrt(p) for p in prob]
+
+    FI_temp = 0
+    for i in range(len(prob_q)-1):
+        FI_temp += (prob_q[i]-prob_q[i+1])**2
+
+    return 4*FI_temp
+
+def SOST(data,w_size,chunk_size=4096):
+    '''Function to calculate the size of states of each variable in a multivariate series
+
+    The size of states of a variable is twice the smallest sample standard deviation over all
+    windows of w_size consecutive points. Windows containing a zero are skipped. Standard deviations
+    are computed on strided window views, chunk_size windows at a time to cap memory.
+
+    Parameters
+    ----------
+
+    data : numpy.ndarray
+        Array of shape (n_points, k), or (n_points,) for a single variable
+
+    w_size : int
+        Number of points in each window
+
+    chunk_size : int
+        Number of windows whose standard deviation is computed at once
+
+    Returns
+    -------
+
+    sost : numpy.ndarray
+        Size of states of each variable. Variables without any valid window get a size of 0
+    '''
+
+    data = np.asarray(data,dtype=float)
+    if data.ndim == 1:
+        data = data.reshape(-1,1)
+
+    num_points, num_vars = data.shape
+    sos = np.zeros(num_vars)
+
+    if num_points < w_size:
+        return sos
+
+    zero_count = np.concatenate((np.zeros((1,num_vars),dtype=int),np.cumsum(data==0,axis=0)))
+    valid = (zero_count[w_size:] - zero_count[:-w_size]) == 0
+    windows = sliding_window_view(data,w_size,axis=0)
+
+    for j in range(num_vars):
+        starts = np.flatnonzero(valid[:,j])
+
+        if len(starts) == 0:
+            continue
+
+        min_std = min(np.std(windows[starts[i:i+chunk_size],j],axis=1,ddof=1).min() for i in range(0,len(starts),chunk_size))
+        sos[j] = min_std*2
+
+    return sos
     
 def smooth_series(series,block_size):
     '''Function to smooth series by averaging chunks
@@ -0,0 +1,143 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+import contextlib
+import multiprocessing as mp
+
+import numpy as np
+
+from multiprocessing import shared_memory
+
+__all__ = [
+    'shared_pool',
+    'shared_call',
+    'worker_array',
+    'default_processes',
+]
+
+#Arrays attached by the current worker process, keyed by name
+SHARED_ARRAYS = {}
+
+def default_processes():
+    '''Default number of worker processes: the cpu count minus two, and at least one'''
+
+    return max(mp.cpu_count() - 2,1)
+
+def pool_context():
+    '''Multiprocessing context for worker pools. Workers are forked where the platform allows it, since they only
+    need the shared memory specs and spawning would re-import the package in every worker'''
+
+    if 'fork' in mp.get_all_start_methods():
+        return mp.get_context('fork')
+
+    return mp.get_context()
+
+def share_array(array):
+    '''Copy an array into a new shared memory block, returning the block and the spec workers attach it with'''
+
+    array = np.ascontiguousarray(array)
+    shm = shared_memory.SharedMemory(create=True,size=max(array.nbytes,1))
+    np.ndarray(array.shape,dtype=array.dtype,buffer=shm.buf)[...] = array
+
+    return shm, (shm.name,array.shape,array.dtype.str)
+
+def attach_arrays(specs):
+    '''Pool initializer attaching the shared arrays described by specs in a worker process'''
+
+    for name,(shm_name,shape,dtype) in specs.items():
+        shm = shared_memory.SharedMemory(name=shm_name)
+        array = np.ndarray(shape,dtype=np.dtype(dtype),buffer=shm.buf)
+        array.flags.writeable = False
+        SHARED_ARRAYS[name] = (shm,array)
+
+def worker_array(name):
+    '''Function to access an array shared with the workers of an ammonyte.utils.parallel.shared_pool
+
+    Parameters
+    ----------
+
+    name : str
+        Name the array was passed to shared_pool with
+
+    Returns
+    -------
+
+    array : numpy.ndarray
+        Read-only view of the shared array
+    '''
+
+    return SHARED_ARRAYS[name][1]
+
+def shared_call(func,names,*args):
+    '''Function to run func on shared arrays inside a worker of an ammonyte.utils.parallel.shared_pool
+
+    Calls func(*arrays, *args) where arrays are the shared arrays called names. func must be importable
+    at module level so it can be sent to the workers.
+
+    Parameters
+    ----------
+
+    func : callable
+        Function to call
+
+    names : tuple
+        Names of the shared arrays passed as the first arguments of func
+
+    args : 
+        Remaining arguments of func
+
+    Returns
+    -------
+
+    res :
+        Return value of func
+    '''
+
+    return func(*[worker_array(name) for name in names],*args)
+
+@contextlib.contextmanager
+def shared_pool(num_processes=None,**arrays):
+    '''Context manager for a process pool whose workers share read-only arrays
+
+    Each keyword array is copied once into shared memory and attached by every worker when it starts,
+    so tasks only send scalars to the workers instead of pickling the arrays with every task. The shared
+    memory is released when the context exits.
+
+    Parameters
+    ----------
+
+    num_processes : int
+        Number of worker processes. Defaults to the cpu count minus two
+
+    arrays : numpy.ndarray
+        Arrays to share, available in the workers through ammonyte.utils.parallel.worker_array
+
+    Yields
+    ------
+
+    pool : multiprocessing.pool.Pool
+        Process pool
+
+    See also
+    --------
+
+    ammonyte.utils.parallel.shared_call
+    '''
+
+    if num_processes is None:
+        num_processes = default_processes()
+
+    blocks = []
+    specs = {}
+
+    try:
+        for name,array in arrays.items():
+            shm, specs[name] = share_array(array)
+            blocks.append(shm)
+
+        with pool_context().Pool(num_processes,initializer=attach_arrays,initargs=(specs,)) as pool:
+            yield pool
+    finally:
+        for shm in blocks:
+            shm.close()
+            shm.unlink()
@@ -0,0 +1,626 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+import numpy as np
+
+from scipy import sparse as sps
+
+from ..utils.distance import recurrence_band
+from ..utils.embedding import time_delay_embed
+
+__all__ = [
+    'line_length_histogram',
+    'windowed_line_histograms',
+    'windowed_rqa',
+    'matrix_line_histograms',
+    'matrix_diagonal_rates',
+    'rqa_measures',
+    'recurrence_rate',
+    'determinism',
+    'average_diagonal_line',
+    'longest_diagonal_line',
+    'entropy_diagonal_lines',
+    'laminarity',
+    'trapping_time',
+    'longest_vertical_line',
+    'trend',
+]
+
+MEASURES = ('RR','DET','L','Lmax','ENTR','LAM','TT','Vmax','TREND')
+DIAGONAL_MEASURES = ('DET','L','Lmax','ENTR')
+VERTICAL_MEASURES = ('RR','LAM','TT','Vmax')
+
+def sliding_windows(time,window_size,overlap):
+    '''Function to find the index bounds of the sliding windows used by windowed RQA
+
+    Windows start every overlap/2 time units and span window_size time units (both ends inclusive),
+    matching pyleoclim.Series.slice. Assumes time is sorted in ascending order.
+
+    Parameters
+    ----------
+
+    time : array
+        Time axis of the series
+
+    window_size : int
+        Size of each window in units of the time axis
+
+    overlap : int
+        Amount of overlap between windows in units of the time axis
+
+    Returns
+    -------
+
+    windows : list
+        List of (start, stop) index pairs, stop being exclusive
+    '''
+
+    time = np.asarray(time)
+    starts = np.arange(int(min(time)),int(max(time)),int(overlap/2))
+
+    cutoff_index = -int(window_size/(overlap/2))
+
+    return [(int(np.searchsorted(time,start,side='left')),int(np.searchsorted(time,start+window_size,side='right')))
+            for start in starts[:cutoff_index]]
+
+def line_length_histogram(lines):
+    '''Function to calculate the histogram of lengths of runs of recurrent points along the rows of a boolean array
+
+    Runs are found with vectorized run-length encoding on the padded, differenced rows.
+
+    Parameters
+    ----------
+
+    lines : numpy.ndarray
+        Boolean array of shape (n_lines, line_length)
+
+    Returns
+    -------
+
+    histogram : numpy.ndarray
+        Array of length line_length where histogram[l-1] is the number of runs of length l.
+        This is the layout used for PyRQA's frequency distributions.
+    '''
+
+    lines = np.asarray(lines,dtype=bool)
+    num_lines, line_length = lines.shape
+
+    padded = np.zeros((num_lines,line_length+2),dtype=np.int8)
+    padded[:,1:-1] = lines
+    edges = np.diff(padded,axis=1)
+
+    lengths = np.flatnonzero(edges == -1) - np.flatnonzero(edges == 1)
+
+    return np.bincount(lengths,minlength=line_length+1)[1:line_length+1].astype(np.uint64)
+
+def run_length_histogram(groups,positions,line_length):
+    '''Histogram of run lengths from the coordinates of recurrent points
+
+    groups and positions must be sorted by group, then position. A run continues as long as the group
+    stays the same and the position increases by one.'''
+
+    if len(groups) == 0:
+        return np.zeros(line_length,dtype=np.uint64)
+
+    breaks = np.flatnonzero((np.diff(groups) != 0) | (np.diff(positions) != 1)) + 1
+    lengths = np.diff(np.concatenate(([0],breaks,[len(groups)])))
+
+    return np.bincount(lengths,minlength=line_length+1)[1:line_length+1].astype(np.uint64)
+
+def matrix_line_histograms(matrix,theiler=1,chunk_size=None):
+    '''Function to calculate the diagonal and vertical line length histograms of a recurrence matrix
+
+    Sparse matrices are handled natively: runs are found by run-length encoding the sorted coordinates of
+    their stored points. Dense matrices are processed chunk_size diagonals or columns at a time.
+
+    Parameters
+    ----------
+
+    matrix : numpy.ndarray, scipy.sparse matrix
+        Square recurrence matrix
+
+    theiler : int
+        Theiler window. Diagonals closer than theiler to the main diagonal are excluded from the diagonal histogram
+
+    chunk_size : int
+        Number of diagonals or columns of a dense matrix handled at once. Defaults to about 2**22 entries per chunk
+
+    Returns
+    -------
+
+    diagonal : numpy.ndarray
+        Diagonal line length histogram, counting lines in both triangles of the matrix
+
+    vertical : numpy.ndarray
+        Vertical line length histogram
+    '''
+
+    n = matrix.shape[0]
+
+    if sps.issparse(matrix):
+        coo = sps.coo_matrix(matrix)
+        rows, cols = coo.row[coo.data != 0], coo.col[coo.data != 0]
+
+        lags = cols.astype(np.int64) - rows
+        off_diagonal = np.abs(lags) >= theiler
+        order = np.lexsort((rows[off_diagonal],lags[off_diagonal]))
+        diagonal = run_length_histogram(lags[off_diagonal][order],rows[off_diagonal][order],n)
+
+        order = np.lexsort((rows,cols))
+        vertical = run_length_histogram(cols[order],rows[order],n)
+
+        return diagonal, vertical
+
+    matrix = np.asarray(matrix,dtype=bool)
+
+    if chunk_size is None:
+        chunk_size = max(1,2**22//max(n,1))
+
+    index = np.arange(n)
+    diagonal = np.zeros(n,dtype=np.uint64)
+
+    for lower in (False,True):
+        #Diagonals below the main diagonal are the diagonals above it in the transpose
+        source = matrix.T if lower else matrix
+
+        for first in range(theiler,n,chunk_size):
+            lags = np.arange(first,min(n,first+chunk_size))
+            cols = index[None,:] + lags[:,None]
+            valid = cols < n
+
+            lines = np.zeros(valid.shape,dtype=bool)
+            lines[valid] = source[np.broadcast_to(index,valid.shape)[valid],cols[valid]]
+            diagonal += line_length_histogram(lines)
+
+    vertical = np.zeros(n,dtype=np.uint64)
+
+    for first in range(0,n,chunk_size):
+        vertical += line_length_histogram(matrix[:,first:first+chunk_size].T)
+
+    return diagonal, vertical
+
+def matrix_diagonal_rates(matrix):
+    '''Function to calculate the recurrence rate along each diagonal above and including the main diagonal
+
+    Parameters
+    ----------
+
+    matrix : numpy.ndarray, scipy.sparse matrix
+        Square recurrence matrix
+
+    Returns
+    -------
+
+    rates : numpy.ndarray
+        Recurrence rate of diagonals 0, ..., n-1
+    '''
+
+    n = matrix.shape[0]
+    counts = np.zeros(n)
+
+    if sps.issparse(matrix):
+        coo = sps.coo_matrix(matrix)
+        lags = coo.col.astype(np.int64) - coo.row
+        counts += np.bincount(lags[(lags >= 0) & (coo.data != 0)],minlength=n)
+    else:
+        chunk_size = max(1,2**22//max(n,1))
+        for first in range(0,n,chunk_size):
+            rows, cols = np.nonzero(matrix[first:first+chunk_size])
+            lags = cols - (rows+first)
+            counts += np.bincount(lags[lags >= 0],minlength=n)
+
+    return counts / np.arange(n,0,-1)
+
+def window_diagonals(band,start,length,first=0):
+    '''Diagonals first, ..., length-1 of a window's recurrence matrix, one per row
+
+    Row k of the band slice is diagonal first+k of the window, valid for its first length-first-k
+    points. Points past the end of each diagonal are masked out.'''
+
+    index = np.arange(length)
+
+    return band[first:length,start:start+length] & (index[None,:] < length - index[first:length,None])
+
+def window_block(band,start,length):
+    '''Full recurrence matrix of a window, gathered from a recurrence band'''
+
+    index = np.arange(length)
+
+    return band[np.abs(index[:,None]-index[None,:]),start+np.minimum(index[:,None],index[None,:])]
+
+def window_diagonal_histogram(band,start,length,theiler=1):
+    '''Diagonal line length histogram of a window, counting lines in both triangles of its recurrence matrix'''
+
+    return 2*line_length_histogram(window_diagonals(band,start,length,theiler).reshape(-1,length))
+
+def window_vertical_histogram(band,start,length):
+    '''Vertical line length histogram of a window'''
+
+    #The window's recurrence matrix is symmetric, so its rows hold the same runs as its columns
+    return line_length_histogram(window_block(band,start,length))
+
+def window_diagonal_rates(band,start,length):
+    '''Recurrence rate along each diagonal 0, ..., length-1 of a window'''
+
+    return np.sum(window_diagonals(band,start,length),axis=1) / np.arange(length,0,-1)
+
+def window_line_histograms(band,start,length,theiler=1):
+    '''Function to calculate the diagonal and vertical line length histograms of a window from a recurrence band
+
+    Parameters
+    ----------
+
+    band : numpy.ndarray
+        Recurrence band, see ammonyte.utils.distance.recurrence_band
+
+    start : int
+        Index of the first point of the window
+
+    length : int
+        Number of points in the window, must not exceed the width of the band
+
+    theiler : int
+        Theiler window. Diagonals closer than theiler to the main diagonal are excluded from the diagonal histogram
+
+    Returns
+    -------
+
+    diagonal : numpy.ndarray
+        Diagonal line length histogram, counting lines in both triangles of the window's recurrence matrix
+
+    vertical : numpy.ndarray
+        Vertical line length histogram
+    '''
+
+    return window_diagonal_histogram(band,start,length,theiler), window_vertical_histogram(band,start,length)
+
+def windowed_band(values,windows,m,tau,eps):
+    '''Embed a series once and compute the recurrence band shared by all windows
+
+    Returns the band (None if no window is long enough to embed) and the number of delay vectors in each window'''
+
+    lengths = [stop-start-(m-1)*tau for start,stop in windows]
+    width = max([0]+lengths)
+
+    if width > 0:
+        embedded_data = time_delay_embed(values,m,tau,trim=False)
+        band = recurrence_band(embedded_data,eps,width)
+    else:
+        band = None
+
+    return band, lengths
+
+def windowed_line_histograms(values,windows,m,tau,eps,theiler=1):
+    '''Function to calculate line length histograms over many windows of a series from one recurrence band
+
+    The series is embedded once and the recurrence band is computed once with a width equal to the
+    longest window, so overlapping windows share their point-pair distances. Each window is embedded
+    like PyRQA's TimeSeries, i.e. a window of n values holds n - (m-1)*tau delay vectors.
+
+    Parameters
+    ----------
+
+    values : array
+        Values of the series
+
+    windows : list
+        List of (start, stop) index pairs, stop being exclusive
+
+    m : int
+        Embedding dimension
+
+    tau : int
+        Embedding delay
+
+    eps : float
+        Size of radius to use to calculate recurrence matrix
+
+    theiler : int
+        Theiler window used for the diagonal line histogram
+
+    Returns
+    -------
+
+    histograms : generator
+        Generator of (diagonal, vertical) histograms, one per window
+    '''
+
+    band, lengths = windowed_band(values,windows,m,tau,eps)
+
+    for (start,_),length in zip(windows,lengths):
+        if length > 0:
+            yield window_line_histograms(band,start,length,theiler)
+        else:
+            yield np.zeros(0,dtype=np.uint64), np.zeros(0,dtype=np.uint64)
+
+def windowed_rqa(values,windows,m,tau,eps,measures=('DET','LAM'),theiler=1,l_min=2,v_min=2):
+    '''Function to calculate several RQA measures over many windows of a series in a single pass
+
+    Shares one recurrence band across windows like ammonyte.utils.rqa.windowed_line_histograms, and only
+    builds the diagonal histogram, vertical histogram or diagonal recurrence rates of a window if one of
+    the requested measures needs it.
+
+    Parameters
+    ----------
+
+    values : array
+        Values of the series
+
+    windows : list
+        List of (start, stop) index pairs, stop being exclusive
+
+    m : int
+        Embedding dimension
+
+    tau : int
+        Embedding delay
+
+    eps : float
+        Size of radius to use to calculate recurrence matrix
+
+    measures : list
+        Measures to calculate, see ammonyte.utils.rqa.rqa_measures
+
+    theiler : int
+        Theiler window. Diagonals closer than theiler to the main diagonal are excluded from diagonal measures and TREND
+
+    l_min : int
+        Minimum diagonal line length
+
+    v_min : int
+        Minimum vertical line length
+
+    Returns
+    -------
+
+    res : generator
+        Generator of dictionaries mapping each measure to its value, one per window
+    '''
+
+    check_measures(measures)
+
+    band, lengths = windowed_band(values,windows,m,tau,eps)
+    empty = np.zeros(0,dtype=np.uint64)
+
+    for (start,_),length in zip(windows,lengths):
+        diagonal, vertical, rates = empty, empty, np.zeros(0)
+
+        if length > 0:
+            if any(measure in DIAGONAL_MEASURES for measure in measures):
+                diagonal = window_diagonal_histogram(band,start,length,theiler)
+            if any(measure in VERTICAL_MEASURES for measure in measures):
+                vertical = window_vertical_histogram(band,start,length)
+            if 'TREND' in measures:
+                rates = window_diagonal_rates(band,start,length)
+
+        yield rqa_measures(diagonal,vertical,rates,measures,theiler,l_min,v_min)
+
+def check_measures(measures):
+    '''Raise an error if any measure isn't recognized'''
+
+    for measure in measures:
+        if measure not in MEASURES:
+            raise ValueError(f'Measure "{measure}" is not recognized. Please use any of {MEASURES}')
+
+def rqa_measures(diagonal,vertical,rates=None,measures=MEASURES,theiler=1,l_min=2,v_min=2):
+    '''Function to calculate classic RQA measures from line length histograms
+
+    Available measures are:
+
+    - 'RR': recurrence rate
+    - 'DET': determinism
+    - 'L': average diagonal line length
+    - 'Lmax': longest diagonal line length
+    - 'ENTR': Shannon entropy of the diagonal line length distribution
+    - 'LAM': laminarity
+    - 'TT': trapping time
+    - 'Vmax': longest vertical line length
+    - 'TREND': trend of the recurrence rate away from the main diagonal
+
+    Parameters
+    ----------
+
+    diagonal : numpy.ndarray
+        Diagonal line length histogram
+
+    vertical : numpy.ndarray
+        Vertical line length histogram, which also gives the size of the recurrence matrix
+
+    rates : numpy.ndarray
+        Recurrence rate of each diagonal, starting from the main diagonal. Only needed for TREND
+
+    measures : list
+        Measures to calculate
+
+    theiler : int
+        Theiler window used for TREND
+
+    l_min : int
+        Minimum diagonal line length
+
+    v_min : int
+        Minimum vertical line length
+
+    Returns
+    -------
+
+    res : dict
+        Dictionary mapping each measure to its value
+    '''
+
+    check_measures(measures)
+
+    res = {}
+
+    for measure in measures:
+        if measure == 'RR':
+            res[measure] = recurrence_rate(vertical)
+        elif measure == 'DET':
+            res[measure] = determinism(diagonal,l_min)
+        elif measure == 'L':
+            res[measure] = average_diagonal_line(diagonal,l_min)
+        elif measure == 'Lmax':
+            res[measure] = longest_diagonal_line(diagonal)
+        elif measure == 'ENTR':
+            res[measure] = entropy_diagonal_lines(diagonal,l_min)
+        elif measure == 'LAM':
+            res[measure] = laminarity(vertical,v_min)
+        elif measure == 'TT':
+            res[measure] = trapping_time(vertical,v_min)
+        elif measure == 'Vmax':
+            res[measure] = longest_vertical_line(vertical)
+        elif measure == 'TREND':
+            res[measure] = trend(rates,theiler)
+
+    return res
+
+def number_of_lines(histogram,min_length):
+    '''Number of lines at least min_length long'''
+
+    if min_length > 0:
+        return np.sum(histogram[min_length - 1:],dtype=np.uint64)
+
+    return np.uint64(0)
+
+def number_of_lines_points(histogram,min_length):
+    '''Number of recurrent points forming lines at least min_length long'''
+
+    if min_length > 0:
+        return np.sum(((np.arange(histogram.size,dtype=np.uint64) + 1) * histogram)[min_length - 1:],dtype=np.uint64)
+
+    return np.uint64(0)
+
+def determinism(diagonal,l_min=2):
+    '''Determinism (DET) from a diagonal line length histogram
+
+    Parameters
+    ----------
+
+    diagonal : numpy.ndarray
+        Diagonal line length histogram
+
+    l_min : int
+        Minimum diagonal line length
+
+    Returns
+    -------
+
+    det : float
+        Fraction of recurrent points forming diagonal lines at least l_min long
+    '''
+
+    with np.errstate(all='ignore'):
+        return np.float32(number_of_lines_points(diagonal,l_min)) / number_of_lines_points(diagonal,1)
+
+def laminarity(vertical,v_min=2):
+    '''Laminarity (LAM) from a vertical line length histogram
+
+    Parameters
+    ----------
+
+    vertical : numpy.ndarray
+        Vertical line length histogram
+
+    v_min : int
+        Minimum vertical line length
+
+    Returns
+    -------
+
+    lam : float
+        Fraction of recurrent points forming vertical lines at least v_min long
+    '''
+
+    with np.errstate(all='ignore'):
+        return np.float32(number_of_lines_points(vertical,v_min)) / number_of_lines_points(vertical,1)
+
+def recurrence_rate(vertical):
+    '''Recurrence rate (RR) from a vertical line length histogram
+
+    Every recurrent point belongs to exactly one vertical line, and the histogram has one entry per row
+    of the recurrence matrix, so the histogram alone gives the fraction of recurrent points.
+    '''
+
+    with np.errstate(all='ignore'):
+        return np.float32(number_of_lines_points(vertical,1)) / (vertical.size*vertical.size)
+
+def average_diagonal_line(diagonal,l_min=2):
+    '''Average length (L) of diagonal lines at least l_min long'''
+
+    with np.errstate(all='ignore'):
+        return np.float32(number_of_lines_points(diagonal,l_min)) / number_of_lines(diagonal,l_min)
+
+def longest_diagonal_line(diagonal):
+    '''Length of the longest diagonal line (Lmax)'''
+
+    try:
+        return np.uint32(np.max(diagonal.nonzero()[0]) + 1)
+    except ValueError:
+        return np.uint(0)
+
+def entropy_diagonal_lines(diagonal,l_min=2):
+    '''Shannon entropy (ENTR) of the distribution of diagonal lines at least l_min long'''
+
+    entropy = np.float32(.0)
+
+    if l_min > 0:
+        line_lengths = np.array(diagonal[l_min - 1:],dtype=np.float32)
+        line_lengths = line_lengths[line_lengths.nonzero()[0]]
+
+        if line_lengths.size > 0:
+            probability = line_lengths / number_of_lines(diagonal,l_min)
+            intermediate_sum = np.sum(probability * np.log(probability))
+
+            #Avoid returning -0.0
+            if intermediate_sum != .0:
+                entropy -= intermediate_sum
+            else:
+                entropy += intermediate_sum
+
+    return entropy
+
+def trapping_time(vertical,v_min=2):
+    '''Trapping time (TT), the average length of vertical lines at least v_min long'''
+
+    with np.errstate(all='ignore'):
+        return np.float32(number_of_lines_points(vertical,v_min)) / number_of_lines(vertical,v_min)
+
+def longest_vertical_line(vertical):
+    '''Length of the longest vertical line (Vmax)'''
+
+    try:
+        return np.uint(np.max(vertical.nonzero()[0]) + 1)
+    except ValueError:
+        return np.uint(0)
+
+def trend(rates,theiler=1):
+    '''Trend (TREND) of the recurrence rate along diagonals moving away from the main diagonal
+
+    Least squares slope of the recurrence rate of diagonal k against k, for k from theiler up to
+    the last 10% of diagonals, which are left out since they hold too few points.
+
+    Parameters
+    ----------
+
+    rates : numpy.ndarray
+        Recurrence rate of each diagonal, starting from the main diagonal
+
+    theiler : int
+        Theiler window, diagonals closer than theiler to the main diagonal are ignored
+
+    Returns
+    -------
+
+    trend : float
+        Slope of the recurrence rate per diagonal. Negative values indicate drift or non-stationarity
+    '''
+
+    stop = len(rates) - int(np.ceil(len(rates)/10))
+    rates = np.asarray(rates[theiler:stop],dtype=float)
+
+    if rates.size < 2:
+        return np.nan
+
+    k = np.arange(rates.size) - (rates.size-1)/2
+
+    return np.sum(k*(rates-np.mean(rates))) / np.sum(k*k)